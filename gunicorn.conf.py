@@ -0,0 +1,22 @@
+"""
+Gunicorn configuration for the Prophet Forecasting API
+Run: gunicorn -c gunicorn.conf.py prophet_api:app
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Batch forecasts already fan out over each worker's Prophet process pool, so a couple of
+# threaded workers serve the requests, and the cores are divided between their pools (instead
+# of every worker starting a pool as large as the machine)
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+os.environ.setdefault('FORECAST_WORKERS', str(max(1, (os.cpu_count() or 1) // workers)))
+
+# Import the app (Prophet and its Stan backend check) once in the master; workers share it after fork
+preload_app = True
+
+# Cold model fits on long series can take a while
+timeout = 300
@@ -3,10 +3,21 @@
 Optimization API using OR-Tools for VRP solving
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import sys
 import os
+import json
+import math
+import hashlib
+import multiprocessing
+import threading
+from collections import Counter, OrderedDict
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import shortest_path
 
 # Try to import OR-Tools
 try:
@@ -17,57 +28,271 @@ except ImportError:
     OR_TOOLS_AVAILABLE = False
     print("WARNING: OR-Tools not installed. Install with: pip install ortools")
 
+# orjson parses large request payloads (the distance matrix) and serializes route responses
+# several times faster than the stdlib json module Flask uses; fall back to Flask's JSON
+# handling when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 app = Flask(__name__)
 CORS(app)
 
-def compute_shortest_paths(distance_matrix_dict, all_nodes):
+# OR-Tools routing search is single-threaded, so extra cores are used by probing several
+# vehicle counts at once in separate processes
+SOLVER_WORKERS = int(os.environ.get('SOLVER_WORKERS', os.cpu_count() or 1))
+
+# Instances with more pickup tasks than this are split into clusters of roughly
+# MAX_CLUSTER_SIZE tasks and solved as independent VRPs
+DECOMPOSITION_THRESHOLD = 200
+MAX_CLUSTER_SIZE = 150
+
+# Solver worker processes, parsed distance matrices and shortest-path results are kept across
+# requests, so repeated re-optimizations of the same map skip process start-up, the payload
+# parse and the all-pairs searches
+SHORTEST_PATH_CACHE_SIZE = 8
+DISTANCE_MATRIX_CACHE_SIZE = 8
+_shortest_path_cache = OrderedDict()
+_distance_matrix_cache = OrderedDict()
+# Requests are served on several threads, so cache lookups and inserts hold this lock
+_cache_lock = threading.Lock()
+_solver_pool = None
+
+def get_solver_pool():
+    """Process pool shared by all requests for parallel feasibility probes
+    
+    Pool processes are spawned rather than forked: the server is multi-threaded, and a fork could
+    copy locks (the cache lock, stdout) held by other request threads
+    """
+    global _solver_pool
+    if _solver_pool is None:
+        _solver_pool = ProcessPoolExecutor(
+            max_workers=max(1, SOLVER_WORKERS), mp_context=multiprocessing.get_context('spawn')
+        )
+    return _solver_pool
+
+def json_response(payload):
+    """JSON response, serialized with orjson when available (sorted keys, like jsonify)"""
+    if orjson is None:
+        return jsonify(payload)
+    return Response(
+        orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SORT_KEYS),
+        mimetype='application/json'
+    )
+
+def parse_distance_matrix(distance_matrix_data):
+    """Convert the request's distance matrix (list of {from, to: [{to, time}]}) to a dense array
+    
+    Returns (matrix, road_node_index): an int32 ndarray of direct travel times (-1 where there
+    is no direct edge) and the mapping from node id to its row/column in matrix.
+    """
+    road_node_index = {}
+    rows, cols, times = [], [], []
+    for entry in distance_matrix_data:
+        from_node = entry.get('from')
+        if not from_node:
+            continue
+        from_idx = road_node_index.setdefault(from_node, len(road_node_index))
+        to_entries = [
+            to_entry for to_entry in entry.get('to', [])
+            if to_entry.get('to') is not None and to_entry.get('time') is not None
+        ]
+        # Extend the edge lists a whole row at a time instead of appending per edge
+        rows.extend([from_idx] * len(to_entries))
+        cols.extend(road_node_index.setdefault(to_entry['to'], len(road_node_index)) for to_entry in to_entries)
+        times.extend(to_entry['time'] for to_entry in to_entries)
+    
+    n = len(road_node_index)
+    matrix = np.full((n, n), -1, dtype=np.int32)
+    matrix[np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)] = np.array(times, dtype=np.int32)
+    return matrix, road_node_index
+
+def cached_parse_distance_matrix(distance_matrix_data):
+    """parse_distance_matrix, memoized on a BLAKE2b digest of the serialized payload
+    
+    Serializing the payload runs in C and is much cheaper than the Python parse, and keying on
+    the content means a changed matrix is never served from the cache. The returned matrix is
+    shared between calls and marked read-only.
+    """
+    if orjson is not None:
+        payload = orjson.dumps(distance_matrix_data)
+    else:
+        payload = json.dumps(distance_matrix_data, separators=(',', ':')).encode()
+    key = hashlib.blake2b(payload, digest_size=16).digest()
+    with _cache_lock:
+        cached = _distance_matrix_cache.get(key)
+        if cached is not None:
+            _distance_matrix_cache.move_to_end(key)
+            return cached
+    
+    matrix, road_node_index = parse_distance_matrix(distance_matrix_data)
+    matrix.setflags(write=False)
+    with _cache_lock:
+        _distance_matrix_cache[key] = (matrix, road_node_index)
+        if len(_distance_matrix_cache) > DISTANCE_MATRIX_CACHE_SIZE:
+            _distance_matrix_cache.popitem(last=False)
+    return matrix, road_node_index
+
+def compute_shortest_paths(distance_matrix, road_node_index, all_nodes):
     """
-    Compute shortest paths between all nodes using Floyd-Warshall algorithm.
+    Compute shortest paths between all nodes using Dijkstra's algorithm (scipy.sparse.csgraph).
     This ensures we have travel times between all node pairs, even if there's no direct edge.
+    Sparse road graphs use repeated Dijkstra (O(V*E log V)); dense graphs where most nodes are
+    required use SciPy's compiled Floyd-Warshall (O(V^3)), which is faster there.
+    
+    distance_matrix and road_node_index are the direct travel times from parse_distance_matrix.
+    all_nodes are the required nodes (market + cauldrons with pickups). Paths may pass through
+    any other node of the road graph, but searches only start from required nodes, so the
+    work is limited to the min-cost paths between required pairs.
+    
+    Returns (dist, node_to_index): an int64 ndarray of travel times between required nodes
+    (999999 where unreachable) and the mapping from node id to its row/column in dist.
+    """
+    num_required = len(all_nodes)
+    n = len(road_node_index)
+    
+    # Required nodes missing from the road graph get their own (edgeless) graph nodes
+    required_idx = np.empty(num_required, dtype=np.intp)
+    for i, node in enumerate(all_nodes):
+        if node in road_node_index:
+            required_idx[i] = road_node_index[node]
+        else:
+            required_idx[i] = n
+            n += 1
+    
+    # Explicitly stored zeros count as edges in csgraph, so zero travel times are kept
+    rows, cols = np.nonzero(distance_matrix >= 0)
+    graph = csr_matrix(
+        (distance_matrix[rows, cols].astype(np.float64), (rows, cols)),
+        shape=(n, n)
+    )
+    if 2 * num_required >= n and 2 * graph.nnz >= n * n:
+        # Dense graph with mostly required nodes (e.g. a full pairwise matrix): SciPy's compiled
+        # Floyd-Warshall is faster than one Dijkstra search per required node here
+        dist = shortest_path(graph, method='FW', directed=True)[np.ix_(required_idx, required_idx)]
+    else:
+        # Required nodes without outgoing edges reach nothing but themselves, so their rows are
+        # filled directly and the searches only start from the others
+        has_edges = np.diff(graph.indptr)[required_idx] > 0
+        dist = np.full((num_required, num_required), np.inf)
+        np.fill_diagonal(dist, 0)
+        if has_edges.any():
+            dist[has_edges] = shortest_path(
+                graph, method='D', directed=True, indices=required_idx[has_edges]
+            )[:, required_idx]
+    
+    # If still unreachable, use a very large number
+    dist[np.isinf(dist)] = 999999
+    dist = dist.astype(np.int64)
+    return dist, {node: i for i, node in enumerate(all_nodes)}
+
+def cached_shortest_paths(distance_matrix, road_node_index, all_nodes):
+    """compute_shortest_paths, memoized on the road graph and the required nodes
+    
+    Entries are keyed by a BLAKE2b digest of the inputs, so the cache holds 16-byte keys rather
+    than copies of the matrices. The returned array is shared between calls and marked read-only.
     """
-    # Initialize distance matrix with infinity for missing paths
-    INF = 10**9  # Large number representing infinity
-    n = len(all_nodes)
-    node_to_index = {node: i for i, node in enumerate(all_nodes)}
-    index_to_node = {i: node for i, node in enumerate(all_nodes)}
-    
-    # Initialize distance matrix
-    dist = [[INF] * n for _ in range(n)]
-    
-    # Set diagonal to 0 (distance from node to itself)
-    for i in range(n):
-        dist[i][i] = 0
-    
-    # Fill in direct edges from distance_matrix_dict
-    for from_node, to_dict in distance_matrix_dict.items():
-        if from_node in node_to_index:
-            from_idx = node_to_index[from_node]
-            for to_node, travel_time in to_dict.items():
-                if to_node in node_to_index:
-                    to_idx = node_to_index[to_node]
-                    dist[from_idx][to_idx] = int(travel_time)
-    
-    # Floyd-Warshall algorithm to find shortest paths
-    for k in range(n):
-        for i in range(n):
-            for j in range(n):
-                if dist[i][k] + dist[k][j] < dist[i][j]:
-                    dist[i][j] = dist[i][k] + dist[k][j]
-    
-    # Convert back to dictionary format
-    result = {}
-    for i, from_node in enumerate(all_nodes):
-        result[from_node] = {}
-        for j, to_node in enumerate(all_nodes):
-            if dist[i][j] < INF:
-                result[from_node][to_node] = dist[i][j]
-            else:
-                # If still unreachable, use a very large number
-                result[from_node][to_node] = 999999
-    
-    return result
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update('\0'.join(map(str, all_nodes)).encode())
+    digest.update(b'\1')
+    digest.update('\0'.join(map(str, road_node_index)).encode())
+    digest.update(b'\1')
+    digest.update(np.ascontiguousarray(distance_matrix))
+    key = digest.digest()
+    with _cache_lock:
+        cached = _shortest_path_cache.get(key)
+        if cached is not None:
+            _shortest_path_cache.move_to_end(key)
+            return cached
+    
+    # Computed outside the lock; concurrent misses on the same key just compute it twice
+    dist, node_to_index = compute_shortest_paths(distance_matrix, road_node_index, all_nodes)
+    dist.setflags(write=False)
+    with _cache_lock:
+        _shortest_path_cache[key] = (dist, node_to_index)
+        if len(_shortest_path_cache) > SHORTEST_PATH_CACHE_SIZE:
+            _shortest_path_cache.popitem(last=False)
+    return dist, node_to_index
+
+def task_priority_bias(task):
+    """Cost adjustment for arcs arriving at a pickup task (negative = visit earlier)"""
+    cauldron = task[0]
+    pickup_amount = task[1]  # Amount for this task
+    risk_level = cauldron.get('riskLevel', 'low')
+    time_until_overflow = cauldron.get('timeUntilOverflow', 999999)
+    current_level = cauldron.get('currentLevel', 0)
+    max_volume = cauldron.get('maxVolume', 100)
+    fullness_ratio = current_level / max_volume if max_volume > 0 else 0
+    
+    # FULLNESS PRIORITY: Full cauldrons get MUCH lower cost (visited first)
+    # This is the most important factor - full cauldrons must be serviced first
+    if fullness_ratio >= 0.9:  # 90%+ full = very high priority
+        fullness_penalty = -200  # Strongly encourage early visit
+    elif fullness_ratio >= 0.75:  # 75%+ full = high priority
+        fullness_penalty = -150  # Encourage early visit
+    elif fullness_ratio >= 0.5:  # 50%+ full = medium priority
+        fullness_penalty = -50  # Slight encouragement
+    else:  # Less than 50% full = lower priority
+        fullness_penalty = 50  # Discourage early visit
+    
+    # Risk level priority: high-risk nodes get lower cost (visited first)
+    if risk_level == 'high':
+        priority_penalty = -100  # Reduce cost for high-risk (encourage early visit)
+    elif risk_level == 'medium':
+        priority_penalty = -25  # Slight reduction for medium-risk
+    else:
+        priority_penalty = 50  # Increase cost for low-risk (discourage early visit)
+    
+    # Urgency penalty: prioritize nodes that will overflow soon
+    if time_until_overflow <= 240:  # Less than 4 hours = very urgent
+        urgency_penalty = -150  # Strongly encourage early visit
+    elif time_until_overflow <= 480:  # Less than 8 hours = urgent
+        urgency_penalty = -75  # Encourage early visit
+    else:
+        urgency_penalty = max(0, (time_until_overflow - 480) // 60)  # Penalty increases for each hour over 8 hours
+    
+    # ENCOURAGE combining pickups: smaller pickups get slightly lower cost
+    # This helps witches fill their 100L capacity by visiting multiple cauldrons
+    # But prioritize larger pickups from full cauldrons
+    if fullness_ratio >= 0.75:
+        # For full cauldrons, prefer larger pickups (fill bag faster)
+        size_bonus = pickup_amount / 5  # Larger pickups from full cauldrons are better
+    else:
+        # For less full cauldrons, smaller pickups are more flexible
+        size_bonus = -pickup_amount / 10  # Smaller pickups get small cost reduction (easier to combine)
+    
+    return fullness_penalty + priority_penalty + urgency_penalty + size_bonus
+
+def solver_matrices(data):
+    """Integer arc-cost matrix, transit-time matrix and demand vector registered with OR-Tools"""
+    distance_matrix = np.asarray(data['distance_matrix'], dtype=np.int64)
+    depot = data['depot']
+    
+    # Arc costs with PRIORITY for FULL cauldrons first
+    # Full/high-level cauldrons get much lower cost (higher priority) to encourage visiting them first
+    # The priority term only depends on the destination node
+    node_bias = np.asarray(data['node_bias'], dtype=np.float64)
+    cost_matrix = distance_matrix + node_bias[None, :]
+    cost_matrix[:, 1:] = np.maximum(1, cost_matrix[:, 1:])  # Ensure positive cost
+    # CRITICAL: Penalize returning to market (depot) with unused capacity >15L
+    # This forces witches to fill their bags before returning
+    # Large penalty for returning to market (encourages filling capacity first)
+    cost_matrix[:, depot] = distance_matrix[:, depot] + 1000
+    
+    # Transit time = travel time + service time at the origin (+ unload time when arriving at market)
+    time_matrix = distance_matrix + np.asarray(data['service_times'], dtype=np.int64)[:, None]
+    time_matrix[:, depot] += data['market_unload_time']
+    
+    return {
+        'cost_matrix': cost_matrix.astype(np.int64),
+        'time_matrix': time_matrix,
+        # Demands are registered as integers; rounding up keeps the solver's load an upper bound
+        # of the real (possibly fractional) pickup volumes
+        'solver_demands': [math.ceil(d) for d in data['demands']],
+    }
 
-def create_data_model(cauldrons_list, couriers, market, distance_matrix, prediction_horizon_minutes=480):
+def create_data_model(cauldrons_list, couriers, market, distance_matrix, road_node_index, prediction_horizon_minutes=480):
     """Create the data model for OR-Tools VRP solver with flexible partial pickups and FUTURE PREDICTION
     
     This model allows witches to:
@@ -77,6 +302,7 @@ def create_data_model(cauldrons_list, couriers, market, distance_matrix, predict
     - PREDICT FUTURE OVERFLOWS and plan routes to prevent them (not just current state)
     
     Args:
+        distance_matrix, road_node_index: Direct travel times from parse_distance_matrix
         prediction_horizon_minutes: How far ahead to predict (default 8 hours = 480 minutes)
     """
     data = {}
@@ -87,35 +313,12 @@ def create_data_model(cauldrons_list, couriers, market, distance_matrix, predict
     
     # PRIORITIZE: Sort cauldrons by FULLNESS FIRST (full ones first), then risk level, then time until overflow
     # This ensures full/high-level cauldrons are processed first
-    def get_priority(cauldron):
-        current_level = cauldron.get('currentLevel', 0)
-        max_volume = cauldron.get('maxVolume', 100)
-        fullness_ratio = current_level / max_volume if max_volume > 0 else 0
-        risk_level = cauldron.get('riskLevel', 'low')
-        risk_priority = {'high': 3, 'medium': 2, 'low': 1}.get(risk_level, 1)
-        time_until_overflow = cauldron.get('timeUntilOverflow', 999999)
-        # Higher priority = higher number
-        # FULLNESS is most important (full cauldrons = highest priority)
-        # Then risk level, then urgency (shorter time = higher priority)
-        return (fullness_ratio * 10, risk_priority, -time_until_overflow)  # Fullness weighted heavily
-    
-    sorted_cauldrons = sorted(cauldrons_list, key=get_priority, reverse=True)
-    print(f"Prioritizing cauldrons: {len([c for c in sorted_cauldrons if c.get('riskLevel') == 'high'])} high-risk, "
-          f"{len([c for c in sorted_cauldrons if c.get('riskLevel') == 'medium'])} medium-risk, "
-          f"{len([c for c in sorted_cauldrons if c.get('riskLevel') == 'low'])} low-risk")
-    
-    # NEW APPROACH: Create flexible pickup tasks (not just 100L chunks)
-    # Each cauldron can have multiple small pickup tasks that can be combined efficiently
-    # This allows witches to visit multiple cauldrons and partially fill from each
-    pickup_tasks = []  # List of (cauldron_data, pickup_amount, min_pickup, max_pickup) tuples
-    cauldron_node_mapping = {}  # Maps cauldronId -> list of node indices
-    
-    for cauldron in sorted_cauldrons:  # Process prioritized cauldrons
-        current_level = cauldron.get('currentLevel', 0)
-        max_volume = cauldron.get('maxVolume', 100)
-        fill_rate = cauldron.get('fillRate', 0.01)  # Liters per minute
+    # Each cauldron's fields are read once; the sort key and the task loop below reuse them
+    # Cauldrons that will not get a task are filtered out first so only eligible ones are sorted
+    risk_priorities = {'high': 3, 'medium': 2, 'low': 1}
+    prioritized = []
+    for cauldron in cauldrons_list:
         time_until_overflow = cauldron.get('timeUntilOverflow', 999999)
-        cauldron_id = cauldron['cauldronId']
         
         # PREDICTIVE FORECASTING: Calculate when this cauldron will overflow in the future
         # After a pickup, the level changes, so we need to predict future overflow times
@@ -137,6 +340,32 @@ def create_data_model(cauldrons_list, couriers, market, distance_matrix, predict
         if not will_overflow_in_horizon and not is_currently_at_risk and not is_medium_risk:
             continue
         
+        current_level = cauldron.get('currentLevel', 0)
+        max_volume = cauldron.get('maxVolume', 100)
+        fullness_ratio = current_level / max_volume if max_volume > 0 else 0
+        risk_priority = risk_priorities.get(cauldron.get('riskLevel', 'low'), 1)
+        # Higher priority = higher number
+        # FULLNESS is most important (full cauldrons = highest priority)
+        # Then risk level, then urgency (shorter time = higher priority)
+        priority = (fullness_ratio * 10, risk_priority, -time_until_overflow)  # Fullness weighted heavily
+        prioritized.append((priority, cauldron, current_level, max_volume, fullness_ratio, time_until_overflow))
+    
+    prioritized.sort(key=itemgetter(0), reverse=True)
+    risk_counts = Counter(cauldron.get('riskLevel') for cauldron in cauldrons_list)
+    print(f"Prioritizing cauldrons: {risk_counts['high']} high-risk, "
+          f"{risk_counts['medium']} medium-risk, "
+          f"{risk_counts['low']} low-risk")
+    
+    # NEW APPROACH: Create flexible pickup tasks (not just 100L chunks)
+    # Each cauldron can have multiple small pickup tasks that can be combined efficiently
+    # This allows witches to visit multiple cauldrons and partially fill from each
+    pickup_tasks = []  # List of (cauldron_data, pickup_amount, min_pickup, max_pickup) tuples
+    cauldron_node_mapping = {}  # Maps cauldronId -> list of node indices
+    
+    for _, cauldron, current_level, max_volume, fullness_ratio, time_until_overflow in prioritized:  # Process prioritized cauldrons
+        fill_rate = cauldron.get('fillRate', 0.01)  # Liters per minute
+        cauldron_id = cauldron['cauldronId']
+        
         # Calculate demand needed to prevent overflow within the prediction horizon
         # We want to bring it to optimal level (75% of max) to give it a safety buffer
         optimal_target = max_volume * optimal_level_ratio
@@ -177,11 +406,8 @@ def create_data_model(cauldrons_list, couriers, market, distance_matrix, predict
         # Create flexible pickup tasks: split into chunks that help fill 100L capacity efficiently
         # For FULL cauldrons, create larger chunks to fill bags faster
         # For less full cauldrons, create smaller chunks for flexibility
-        remaining_demand = target_demand
-        node_indices = []
         
         # Determine chunk sizes based on fullness
-        fullness_ratio = current_level / max_volume if max_volume > 0 else 0
         if fullness_ratio >= 0.9:  # Very full - use larger chunks to fill bags quickly
             chunk_sizes = [50, 40, 30, 20]  # Prefer larger chunks
         elif fullness_ratio >= 0.75:  # Full - medium chunks
@@ -189,59 +415,77 @@ def create_data_model(cauldrons_list, couriers, market, distance_matrix, predict
         else:  # Less full - smaller chunks for flexibility
             chunk_sizes = [30, 25, 20, 15]
         
-        while remaining_demand > 0.1:  # Continue until demand is very small
-            # Find the largest chunk size that fits
-            pickup_amount = 0
-            for chunk_size in chunk_sizes:
-                if remaining_demand >= chunk_size:
-                    pickup_amount = chunk_size
-                    break
-            
-            # If no chunk fits, use remaining demand (but cap appropriately)
-            if pickup_amount == 0:
-                if fullness_ratio >= 0.75:
-                    pickup_amount = min(remaining_demand, 40)  # Larger chunks for full cauldrons
-                else:
-                    pickup_amount = min(remaining_demand, 30)  # Smaller chunks for less full
-            
-            # Create a task with flexible pickup range
-            # min_pickup: at least 10L (minimum viable pickup)
-            # max_pickup: the chunk size (can pick up this much)
-            min_pickup = min(10, pickup_amount)  # At least 10L
-            max_pickup = pickup_amount  # Can pick up the full chunk
-            
-            pickup_tasks.append((cauldron, pickup_amount, min_pickup, max_pickup))
-            node_index = len(pickup_tasks)  # +1 because market is node 0
-            node_indices.append(node_index)
-            remaining_demand -= pickup_amount
-        
-        cauldron_node_mapping[cauldron_id] = node_indices
+        # Greedy split: always take the largest chunk size that fits
+        # divmod gives how many chunks of each size fit in one step instead of subtracting one at a time
+        remaining_demand = target_demand
+        pickup_amounts = []
+        for chunk_size in chunk_sizes:
+            chunk_count, remaining_demand = divmod(remaining_demand, chunk_size)
+            pickup_amounts.extend([chunk_size] * int(chunk_count))
+        
+        # Whatever is left is smaller than every chunk size - pick it up as one final task
+        if remaining_demand > 0.1:  # Ignore a very small remainder
+            pickup_amounts.append(remaining_demand)
+        
+        # Create tasks with flexible pickup range
+        # min_pickup: at least 10L (minimum viable pickup)
+        # max_pickup: the chunk size (can pick up this much)
+        first_node_index = len(pickup_tasks) + 1  # +1 because market is node 0
+        pickup_tasks.extend((cauldron, amount, min(10, amount), amount) for amount in pickup_amounts)
+        cauldron_node_mapping[cauldron_id] = list(range(first_node_index, len(pickup_tasks) + 1))
+    
+    # Per-node lists (node 0 is the market), filled in a single pass over the tasks:
+    # - demands: target pickup amount (can be adjusted by solver if needed)
+    # - min/max pickups: flexible pickup range for each task
+    # - time windows: [0, time_until_overflow - safety_margin] - service cauldrons BEFORE they
+    #   overflow (with safety margin), which prevents future overflows, not just current ones
+    # - service times: 5 min pickup time at cauldrons (time to collect potions from cauldron)
+    # - node bias: priority cost adjustment for arriving at the node, computed once here
+    #   instead of on every solve attempt
+    # - overflow times and cauldron codes: read once from the cauldron dicts for validating and
+    #   combining stops during route extraction
+    locations = [market['id']]
+    demands, min_pickups, max_pickups = [0], [0], [0]
+    time_windows = [(0, 999999)]  # Market: can be visited anytime
+    service_times = [0]  # Market: 0 min (no service time when starting from market)
+    node_bias = [0]
+    overflow_times = [999999]  # Market: never overflows
+    cauldron_codes = {}  # Maps cauldronId -> small integer code
+    node_cauldrons = [-1]
+    for task in pickup_tasks:
+        cauldron, pickup_amount, min_pickup, max_pickup = task
+        cauldron_id = cauldron['cauldronId']
+        overflow_time = int(cauldron.get('timeUntilOverflow', 999999))
+        locations.append(cauldron_id)
+        demands.append(pickup_amount)
+        min_pickups.append(min_pickup)
+        max_pickups.append(max_pickup)
+        time_windows.append((0, max(0, min(overflow_time - safety_margin_minutes, 10080))))
+        service_times.append(5)
+        node_bias.append(task_priority_bias(task))
+        overflow_times.append(overflow_time)
+        node_cauldrons.append(cauldron_codes.setdefault(cauldron_id, len(cauldron_codes)))
     
     # Create node list: [market, ...pickup_tasks]
-    data['locations'] = [market['id']] + [c[0]['cauldronId'] for c in pickup_tasks]
+    data['locations'] = locations
     num_nodes = len(data['locations'])
     
-    # Compute shortest paths between all nodes using Floyd-Warshall
+    # Compute shortest paths between all nodes using Dijkstra
     # First, get unique cauldron IDs for distance matrix
-    unique_cauldron_ids = [market['id']] + list(set([c[0]['cauldronId'] for c in pickup_tasks]))
-    complete_distance_matrix = compute_shortest_paths(distance_matrix, unique_cauldron_ids)
+    # Sorted so the same set of cauldrons always maps to the same cached result
+    unique_cauldron_ids = [market['id']] + sorted(cauldron_codes)
+    complete_distance_matrix, node_to_index = cached_shortest_paths(distance_matrix, road_node_index, unique_cauldron_ids)
     
     # Build distance matrix for all nodes (including duplicates)
     # For duplicate nodes (same cauldron), use distance to the cauldron
-    data['distance_matrix'] = []
-    for i, from_node in enumerate(data['locations']):
-        row = []
-        for j, to_node in enumerate(data['locations']):
-            if i == j:
-                row.append(0)
-            else:
-                # Get travel time from complete distance matrix
-                travel_time = complete_distance_matrix.get(from_node, {}).get(to_node, 999999)
-                # Cap at reasonable maximum (24 hours = 1440 minutes)
-                if travel_time >= 999999:
-                    travel_time = 1440
-                row.append(int(travel_time))
-        data['distance_matrix'].append(row)
+    # A single fancy-index gather replaces the per-cell lookups
+    location_idx = np.array([node_to_index[node] for node in data['locations']], dtype=np.intp)
+    travel_times = complete_distance_matrix[np.ix_(location_idx, location_idx)]
+    # Cap unreachable pairs at reasonable maximum (24 hours = 1440 minutes)
+    travel_times[travel_times >= 999999] = 1440
+    np.fill_diagonal(travel_times, 0)
+    # Kept as a dense int32 array (4 bytes per entry) rather than a list of lists of Python ints
+    data['distance_matrix'] = travel_times.astype(np.int32)
     
     # Number of vehicles: Start with fewer vehicles - the solver will find the minimum
     # Upper bound: one courier per pickup task (worst case)
@@ -251,31 +495,23 @@ def create_data_model(cauldrons_list, couriers, market, distance_matrix, predict
     # Depot (market) is always node 0
     data['depot'] = 0
     
-    # Demands: 0 for market, pickup amount for each task
-    # Use the target pickup amount (can be adjusted by solver if needed)
-    data['demands'] = [0] + [c[1] for c in pickup_tasks]  # c[1] is the pickup_amount
-    
-    # Store min/max pickup constraints for each task
-    data['min_pickups'] = [0] + [c[2] for c in pickup_tasks]  # c[2] is min_pickup
-    data['max_pickups'] = [0] + [c[3] for c in pickup_tasks]  # c[3] is max_pickup
+    data['demands'] = demands
+    data['min_pickups'] = min_pickups
+    data['max_pickups'] = max_pickups
     
     # Vehicle capacities - each courier can carry 100 liters
     data['vehicle_capacities'] = [courier_capacity] * data['num_vehicles']
     
-    # Time windows: [0, time_until_overflow - safety_margin] for each task
-    # We want to service cauldrons BEFORE they overflow (with safety margin)
-    # This prevents future overflows, not just current ones
-    data['time_windows'] = [(0, 999999)]  # Market: can be visited anytime
-    data['time_windows'].extend([
-        (0, max(0, min(int(c[0].get('timeUntilOverflow', 999999)) - safety_margin_minutes, 10080))) 
-        for c in pickup_tasks
-    ])
-    
-    # Service times: 
-    # - Market: 0 min (no service time when starting from market)
-    # - Cauldrons: 5 min pickup time (time to collect potions from cauldron)
-    data['service_times'] = [0] + [5] * len(pickup_tasks)  # 5 min pickup time at cauldrons
+    data['time_windows'] = time_windows
+    data['service_times'] = service_times
     data['market_unload_time'] = 15  # 15 minutes to unload at market
+    data['node_bias'] = node_bias
+    data['overflow_times'] = np.array(overflow_times, dtype=np.int64)
+    data['safety_margin_minutes'] = safety_margin_minutes
+    data['node_cauldrons'] = np.array(node_cauldrons, dtype=np.int64)
+    
+    # Solver inputs shared by every solve attempt, built once here instead of per attempt
+    data.update(solver_matrices(data))
     
     # Store mapping for solution extraction
     data['cauldron_node_mapping'] = cauldron_node_mapping
@@ -284,8 +520,16 @@ def create_data_model(cauldrons_list, couriers, market, distance_matrix, predict
     
     return data
 
-def solve_vrp_with_vehicles(data, cauldrons, couriers, num_vehicles, optimize_for_time=False):
-    """Solve VRP with a specific number of vehicles"""
+def solve_vrp_with_vehicles(data, cauldrons, couriers, num_vehicles, optimize_for_time=False, feasibility_only=False,
+                            initial_routes=None):
+    """Solve VRP with a specific number of vehicles
+    
+    Args:
+        feasibility_only: Stop at the first feasible solution with a short time limit
+            (used to probe whether num_vehicles couriers are enough)
+        initial_routes: Optional known feasible routes (lists of task nodes, at most num_vehicles)
+            to start the local search from instead of building a first solution
+    """
     if not OR_TOOLS_AVAILABLE:
         raise Exception("OR-Tools not available. Please install: pip install ortools")
     
@@ -299,88 +543,13 @@ def solve_vrp_with_vehicles(data, cauldrons, couriers, num_vehicles, optimize_fo
     # Create routing model
     routing = pywrapcp.RoutingModel(manager)
     
-    # Define transit callback with PRIORITY for FULL cauldrons first
-    # Full/high-level cauldrons get much lower cost (higher priority) to encourage visiting them first
-    def transit_callback(from_index, to_index):
-        """Returns the travel time between two nodes (for cost calculation)"""
-        from_node = manager.IndexToNode(from_index)
-        to_node = manager.IndexToNode(to_index)
-        base_cost = data['distance_matrix'][from_node][to_node]
-        
-        # CRITICAL: Penalize returning to market (depot) with unused capacity >15L
-        # This forces witches to fill their bags before returning
-        if to_node == data['depot']:  # Returning to market
-            # Get current capacity from the route
-            # We'll add a large penalty if there's significant unused capacity
-            # This will be handled by the capacity dimension, but we can add a cost penalty here too
-            # The solver will naturally try to minimize this
-            return base_cost + 1000  # Large penalty for returning to market (encourages filling capacity first)
-        
-        # Add priority penalty: FULL cauldrons get much lower cost (visited first)
-        # This encourages the solver to visit full/high-level cauldrons first
-        if to_node > 0:  # Not the depot (market)
-            task_idx = to_node - 1
-            if task_idx < len(data['pickup_tasks']):
-                task = data['pickup_tasks'][task_idx]
-                cauldron = task[0]
-                pickup_amount = task[1]  # Amount for this task
-                risk_level = cauldron.get('riskLevel', 'low')
-                time_until_overflow = cauldron.get('timeUntilOverflow', 999999)
-                current_level = cauldron.get('currentLevel', 0)
-                max_volume = cauldron.get('maxVolume', 100)
-                fullness_ratio = current_level / max_volume if max_volume > 0 else 0
-                
-                # FULLNESS PRIORITY: Full cauldrons get MUCH lower cost (visited first)
-                # This is the most important factor - full cauldrons must be serviced first
-                if fullness_ratio >= 0.9:  # 90%+ full = very high priority
-                    fullness_penalty = -200  # Strongly encourage early visit
-                elif fullness_ratio >= 0.75:  # 75%+ full = high priority
-                    fullness_penalty = -150  # Encourage early visit
-                elif fullness_ratio >= 0.5:  # 50%+ full = medium priority
-                    fullness_penalty = -50  # Slight encouragement
-                else:  # Less than 50% full = lower priority
-                    fullness_penalty = 50  # Discourage early visit
-                
-                # Risk level priority: high-risk nodes get lower cost (visited first)
-                if risk_level == 'high':
-                    priority_penalty = -100  # Reduce cost for high-risk (encourage early visit)
-                elif risk_level == 'medium':
-                    priority_penalty = -25  # Slight reduction for medium-risk
-                else:
-                    priority_penalty = 50  # Increase cost for low-risk (discourage early visit)
-                
-                # Urgency penalty: prioritize nodes that will overflow soon
-                if time_until_overflow <= 240:  # Less than 4 hours = very urgent
-                    urgency_penalty = -150  # Strongly encourage early visit
-                elif time_until_overflow <= 480:  # Less than 8 hours = urgent
-                    urgency_penalty = -75  # Encourage early visit
-                else:
-                    urgency_penalty = max(0, (time_until_overflow - 480) // 60)  # Penalty increases for each hour over 8 hours
-                
-                # ENCOURAGE combining pickups: smaller pickups get slightly lower cost
-                # This helps witches fill their 100L capacity by visiting multiple cauldrons
-                # But prioritize larger pickups from full cauldrons
-                if fullness_ratio >= 0.75:
-                    # For full cauldrons, prefer larger pickups (fill bag faster)
-                    size_bonus = pickup_amount / 5  # Larger pickups from full cauldrons are better
-                else:
-                    # For less full cauldrons, smaller pickups are more flexible
-                    size_bonus = -pickup_amount / 10  # Smaller pickups get small cost reduction (easier to combine)
-                
-                return max(1, base_cost + fullness_penalty + priority_penalty + urgency_penalty + size_bonus)  # Ensure positive cost
-        
-        return base_cost
-    
-    transit_callback_index = routing.RegisterTransitCallback(transit_callback)
+    # Arc costs with PRIORITY for FULL cauldrons first (precomputed in create_data_model)
+    # Registered as a matrix, so OR-Tools evaluates arcs without calling back into Python
+    transit_callback_index = routing.RegisterTransitMatrix(data['cost_matrix'].tolist())
     routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
     
     # Add capacity constraint
-    def demand_callback(from_index):
-        """Returns the demand (volume) at a node"""
-        from_node = manager.IndexToNode(from_index)
-        return data['demands'][from_node]
-    
-    demand_callback_index = routing.RegisterUnaryTransitCallback(demand_callback)
+    demand_callback_index = routing.RegisterUnaryTransitVector(data['solver_demands'])
     # Use the first num_vehicles capacities
     vehicle_capacities = data['vehicle_capacities'][:num_vehicles]
     capacity_dimension = routing.AddDimensionWithVehicleCapacity(
@@ -406,19 +575,8 @@ def solve_vrp_with_vehicles(data, cauldrons, couriers, num_vehicles, optimize_fo
         # Instead, we'll rely on the transit callback to penalize returning to market
         # and the solver will naturally try to fill capacity to minimize total cost
     
-    # Add time dimension for time window constraints
-    def time_callback(from_index, to_index):
-        """Returns the transit time from one node to another"""
-        from_node = manager.IndexToNode(from_index)
-        to_node = manager.IndexToNode(to_index)
-        travel_time = data['distance_matrix'][from_node][to_node]
-        service_time = data['service_times'][from_node]
-        
-        if to_node == data['depot']:
-            return travel_time + service_time + data['market_unload_time']
-        return travel_time + service_time
-    
-    time_callback_index = routing.RegisterTransitCallback(time_callback)
+    # Add time dimension for time window constraints (transit times precomputed in create_data_model)
+    time_callback_index = routing.RegisterTransitMatrix(data['time_matrix'].tolist())
     routing.AddDimension(
         time_callback_index,
         999999,  # allow waiting time (slack)
@@ -440,10 +598,11 @@ def solve_vrp_with_vehicles(data, cauldrons, couriers, num_vehicles, optimize_fo
     # Set search parameters optimized for vehicle minimization AND priority
     search_parameters = pywrapcp.DefaultRoutingSearchParameters()
     
-    # CRITICAL: Use AUTOMATIC strategy which tries multiple approaches including vehicle minimization
-    # This is better than PATH_CHEAPEST_ARC for finding solutions with fewer vehicles
+    # CRITICAL: Use PARALLEL_CHEAPEST_INSERTION, which builds all routes at once by inserting
+    # tasks where they are cheapest - finds feasible time-windowed solutions faster than AUTOMATIC
+    # and pairs well with GUIDED_LOCAL_SEARCH on capacitated VRPs with time windows
     search_parameters.first_solution_strategy = (
-        routing_enums_pb2.FirstSolutionStrategy.AUTOMATIC
+        routing_enums_pb2.FirstSolutionStrategy.PARALLEL_CHEAPEST_INSERTION
     )
     
     # Use GUIDED_LOCAL_SEARCH for better solutions (better than GREEDY_DESCENT for vehicle minimization)
@@ -468,19 +627,268 @@ def solve_vrp_with_vehicles(data, cauldrons, couriers, num_vehicles, optimize_fo
     else:
         search_parameters.solution_limit = 200  # Allow more solutions to explore better routes
     
+    # Feasibility probe: any solution answers the question, so stop at the first one
+    if feasibility_only:
+        search_parameters.time_limit.seconds = 5
+        search_parameters.solution_limit = 1
+    
+    # Close the model with the final parameters (fixes the vehicle fixed costs and filters used
+    # by the insertion heuristic) before solving
+    routing.CloseModelWithParameters(search_parameters)
+    
+    # Warm start from the known feasible routes (unused vehicles get empty routes)
+    initial_assignment = None
+    if initial_routes is not None:
+        padded_routes = [
+            [manager.NodeToIndex(node) for node in route] for route in initial_routes
+        ] + [[] for _ in range(num_vehicles - len(initial_routes))]
+        initial_assignment = routing.ReadAssignmentFromRoutes(padded_routes, True)
+    
     # Solve
-    solution = routing.SolveWithParameters(search_parameters)
+    if initial_assignment is not None:
+        solution = routing.SolveFromAssignmentWithParameters(initial_assignment, search_parameters)
+    else:
+        solution = routing.SolveWithParameters(search_parameters)
     return solution, routing, manager, time_dimension
 
-def solve_vrp(data, cauldrons, couriers, optimize_for_time=False, max_vehicles_limit=None):
-    """Solve VRP using OR-Tools with TRUE vehicle minimization - start from 1 and work up
+def solution_routes(solution, routing, manager, num_vehicles):
+    """Task nodes visited by each vehicle (market excluded), in visiting order"""
+    routes = []
+    for vehicle_id in range(num_vehicles):
+        route = []
+        index = solution.Value(routing.NextVar(routing.Start(vehicle_id)))
+        while not routing.IsEnd(index):
+            route.append(manager.IndexToNode(index))
+            index = solution.Value(routing.NextVar(index))
+        routes.append(route)
+    return routes
+
+def probe_vehicle_count(data, num_vehicles):
+    """Worker-process entry point: routes of a feasible solution with num_vehicles couriers, or None"""
+    solution, routing, manager, _ = solve_vrp_with_vehicles(data, None, None, num_vehicles, feasibility_only=True)
+    return solution_routes(solution, routing, manager, num_vehicles) if solution else None
+
+def route_schedule_feasible(route, time_matrix, time_windows):
+    """Whether a route (task nodes, starting from the market at time 0) meets every time window"""
+    time, node = 0, 0
+    for next_node in route:
+        time = max(time_windows[next_node][0], time + time_matrix[node][next_node])
+        if time > time_windows[next_node][1]:
+            return False
+        node = next_node
+    return True
+
+def nearest_neighbor_routes(data):
+    """Greedy nearest-neighbour routes respecting capacity and time windows, improved by 2-opt
+    
+    Each route repeatedly moves to the nearest task that still fits in the bag and can be
+    reached before its deadline, then returns to the market. Used as a feasible starting point
+    for the solver and as an upper bound on the number of couriers.
+    
+    Returns a list of routes (task nodes, market excluded), or None if some task cannot be
+    reached in time even on a route of its own.
+    """
+    travel_times = np.asarray(data['distance_matrix'], dtype=np.int64)
+    time_matrix = data['time_matrix']
+    cost_matrix = data['cost_matrix']
+    time_windows = data['time_windows']
+    demands = np.asarray(data['solver_demands'], dtype=np.int64)
+    capacity = data['vehicle_capacities'][0] if data['vehicle_capacities'] else 100
+    earliest = np.array([window[0] for window in time_windows], dtype=np.int64)
+    latest = np.array([window[1] for window in time_windows], dtype=np.int64)
+    
+    unvisited = np.ones(len(time_windows), dtype=bool)
+    unvisited[0] = False
+    routes = []
+    while unvisited.any():
+        route, node, load, time = [], 0, 0, 0
+        while True:
+            reachable = unvisited & (load + demands <= capacity) & (time + time_matrix[node] <= latest)
+            if not reachable.any():
+                break
+            next_node = int(np.argmin(np.where(reachable, travel_times[node], np.iinfo(np.int64).max)))
+            time = max(earliest[next_node], time + time_matrix[node, next_node])
+            load += demands[next_node]
+            unvisited[next_node] = False
+            route.append(next_node)
+            node = next_node
+        if not route:
+            return None
+        routes.append(route)
+    
+    # 2-opt: reverse route segments while that lowers the route cost and keeps every time window
+    time_matrix_rows = time_matrix.tolist()
+    cost_rows = cost_matrix.tolist()
+    for route in routes:
+        improved = True
+        while improved:
+            improved = False
+            path = [0] + route + [0]
+            for i in range(1, len(path) - 2):
+                for j in range(i + 1, len(path) - 1):
+                    candidate = path[:i] + path[i:j + 1][::-1] + path[j + 1:]
+                    delta = (sum(cost_rows[a][b] for a, b in zip(candidate[i - 1:j + 1], candidate[i:j + 2]))
+                             - sum(cost_rows[a][b] for a, b in zip(path[i - 1:j + 1], path[i:j + 2])))
+                    if delta < 0 and route_schedule_feasible(candidate[1:-1], time_matrix_rows, time_windows):
+                        path = candidate
+                        improved = True
+            route[:] = path[1:-1]
+    
+    return routes
+
+def partition_tasks(data, max_cluster_size=MAX_CLUSTER_SIZE):
+    """Split the pickup task nodes into clusters by urgency, then by travel-time proximity
+    
+    Returns a list of node index arrays (the market, node 0, is never included)
+    """
+    travel_times = data['distance_matrix']
+    task_nodes = np.arange(1, len(data['time_windows']))
+    latest_arrival = np.array([window[1] for window in data['time_windows'][1:]])
+    
+    # Urgency buckets: urgent (< 2h), medium (< 6h), slack
+    buckets = np.digitize(latest_arrival, [120, 360])
+    
+    clusters = []
+    for bucket in range(3):
+        nodes = task_nodes[buckets == bucket]
+        if len(nodes) == 0:
+            continue
+        num_clusters = math.ceil(len(nodes) / max_cluster_size)
+        if num_clusters == 1:
+            clusters.append(nodes)
+            continue
+        
+        # k-medoids on round-trip travel times, seeded with farthest-point picks
+        sub = travel_times[np.ix_(nodes, nodes)].astype(np.int64)
+        round_trip = sub + sub.T
+        medoids = [int(np.argmax(travel_times[0, nodes]))]
+        for _ in range(num_clusters - 1):
+            medoids.append(int(np.argmax(round_trip[:, medoids].min(axis=1))))
+        for _ in range(10):
+            labels = np.argmin(round_trip[:, medoids], axis=1)
+            new_medoids = []
+            for k, medoid in enumerate(medoids):
+                members = np.flatnonzero(labels == k)
+                if len(members) == 0:
+                    new_medoids.append(medoid)
+                    continue
+                new_medoids.append(int(members[np.argmin(round_trip[np.ix_(members, members)].sum(axis=1))]))
+            if new_medoids == medoids:
+                break
+            medoids = new_medoids
+        labels = np.argmin(round_trip[:, medoids], axis=1)
+        clusters.extend(nodes[labels == k] for k in range(num_clusters) if np.any(labels == k))
+    
+    return clusters
+
+def subset_data_model(data, task_nodes, num_vehicles):
+    """Data model restricted to the market plus the given task nodes"""
+    nodes = [0] + [int(node) for node in task_nodes]
+    sub = {
+        key: [data[key][node] for node in nodes]
+        for key in ('locations', 'demands', 'min_pickups', 'max_pickups', 'time_windows', 'service_times', 'node_bias')
+    }
+    sub['distance_matrix'] = data['distance_matrix'][np.ix_(nodes, nodes)]
+    sub['overflow_times'] = data['overflow_times'][nodes]
+    sub['node_cauldrons'] = data['node_cauldrons'][nodes]
+    sub['pickup_tasks'] = [data['pickup_tasks'][node - 1] for node in nodes[1:]]
+    sub['cauldron_node_mapping'] = {}
+    for node, task in enumerate(sub['pickup_tasks'], start=1):
+        sub['cauldron_node_mapping'].setdefault(task[0]['cauldronId'], []).append(node)
+    sub['num_vehicles'] = num_vehicles
+    sub['vehicle_capacities'] = [data['vehicle_capacities'][0]] * num_vehicles
+    sub['depot'] = 0
+    sub['market_unload_time'] = data['market_unload_time']
+    sub['safety_margin_minutes'] = data['safety_margin_minutes']
+    sub['original_cauldrons'] = data['original_cauldrons']
+    sub.update(solver_matrices(sub))
+    return sub
+
+def relax_time_windows(data):
+    """Copy of the data model with the deadlines at the overflow times (no safety margin)"""
+    relaxed = dict(data)
+    relaxed['time_windows'] = [(0, 999999)] + [
+        (0, max(0, min(overflow_time, 10080))) for overflow_time in data['overflow_times'][1:].tolist()
+    ]
+    relaxed['safety_margin_minutes'] = 0
+    return relaxed
+
+def apportion(total, sizes):
+    """Split `total` into one integer share per size, at least 1 each, summing exactly to `total`
+    
+    Each size first gets 1; the rest is divided proportionally with the largest-remainder method.
+    Requires total >= len(sizes).
+    """
+    sizes = np.asarray(sizes, dtype=np.float64)
+    quotas = (total - len(sizes)) * sizes / sizes.sum()
+    shares = np.floor(quotas).astype(np.int64)
+    leftover = total - len(sizes) - int(shares.sum())
+    # Stable sort, so ties go to the earlier (more urgent) cluster
+    shares[np.argsort(-(quotas - shares), kind='stable')[:leftover]] += 1
+    return (shares + 1).tolist()
+
+def solve_vrp_decomposed(data, cauldrons, couriers, optimize_for_time=False, max_vehicles_limit=None):
+    """Solve a large instance as independent per-cluster VRPs and concatenate the routes
+    
+    The routing search scales poorly past a few hundred nodes, so each cluster from
+    partition_tasks is solved on its own. The courier budget (the fleet, capped at
+    max_vehicles_limit when set) is apportioned across the clusters so the shares add up to it
+    exactly, and each cluster draws its couriers from its own disjoint slice of the list.
+    """
+    clusters = partition_tasks(data)
+    num_tasks = len(data['pickup_tasks'])
+    budget = data['num_vehicles']
+    if max_vehicles_limit is not None:
+        budget = min(budget, max_vehicles_limit)
+    if budget < 1:
+        raise Exception("No couriers available for the routes.")
+    
+    # Every cluster needs at least one courier: merge the two smallest clusters until that fits
+    while len(clusters) > budget:
+        first, second = sorted(np.argsort([len(nodes) for nodes in clusters], kind='stable')[:2])
+        clusters[first] = np.sort(np.concatenate([clusters[first], clusters[second]]))
+        del clusters[second]
+    shares = apportion(budget, [len(nodes) for nodes in clusters])
+    print(f"Large instance ({num_tasks} pickup tasks) - solving {len(clusters)} clusters independently...")
+    
+    routes = []
+    num_couriers = 0
+    total_time = 0
+    courier_start = 0
+    for cluster_id, (nodes, share) in enumerate(zip(clusters, shares)):
+        print(f"Cluster {cluster_id + 1}/{len(clusters)}: {len(nodes)} pickup tasks, up to {share} courier(s)")
+        cluster_couriers = couriers[courier_start:courier_start + share]
+        courier_start += share
+        result = solve_vrp(
+            subset_data_model(data, nodes, min(share, len(nodes))), cauldrons,
+            cluster_couriers, optimize_for_time,
+            share if max_vehicles_limit is not None else None, decompose=False
+        )
+        routes.extend(result['routes'])
+        num_couriers += result['numCouriers']
+        total_time = max(total_time, result['totalTime'])
+    
+    routes.sort(key=itemgetter('courierId'))
+    
+    return {
+        'numCouriers': num_couriers,
+        'routes': routes,
+        'totalTime': total_time
+    }
+
+def solve_vrp(data, cauldrons, couriers, optimize_for_time=False, max_vehicles_limit=None, decompose=True):
+    """Solve VRP using OR-Tools with TRUE vehicle minimization - binary search on the vehicle count
     
     Args:
         max_vehicles_limit: Optional maximum number of vehicles to use (e.g., 4 to force 4-witch solution)
+        decompose: Split instances above DECOMPOSITION_THRESHOLD tasks into independently solved clusters
     """
     if not OR_TOOLS_AVAILABLE:
         raise Exception("OR-Tools not available. Please install: pip install ortools")
     
+    if decompose and len(data['pickup_tasks']) > DECOMPOSITION_THRESHOLD:
+        return solve_vrp_decomposed(data, cauldrons, couriers, optimize_for_time, max_vehicles_limit)
+    
     max_vehicles = data['num_vehicles']
     
     # If max_vehicles_limit is set, cap the search at that limit
@@ -488,37 +896,78 @@ def solve_vrp(data, cauldrons, couriers, optimize_for_time=False, max_vehicles_l
         max_vehicles = min(max_vehicles, max_vehicles_limit)
         print(f"CONSTRAINED to maximum {max_vehicles_limit} vehicles - finding OPTIMAL solution with 4 or fewer couriers...")
     
-    # LINEAR SEARCH: Start from 1 vehicle and work up to find the TRUE minimum
-    # This is more reliable than binary search for finding the absolute minimum
+    # BINARY SEARCH: Find the TRUE minimum number of vehicles with short feasibility probes
+    # Each probe stops at the first feasible solution, so only O(log max_vehicles) cheap solves
+    # are needed instead of one full-length solve per vehicle count
+    # With several solver workers, each round probes several counts in parallel processes
     best_solution = None
     best_routing = None
     best_manager = None
     best_time_dimension = None
     min_vehicles_needed = max_vehicles
     
-    print(f"Finding OPTIMAL solution with 4 or fewer couriers (trying 1, 2, 3, 4... up to {max_vehicles})...")
+    print(f"Finding OPTIMAL solution with 4 or fewer couriers (binary search between 1 and {max_vehicles})...")
+    
+    low, high = 1, max_vehicles
+    feasible_probe = None  # Smallest feasible count so far: (num_vehicles, routes of a feasible solution)
+    
+    # Greedy nearest-neighbour routes are feasible by construction: their route count caps the
+    # search and they warm-start the solver if no smaller count is found
+    seed_routes = nearest_neighbor_routes(data)
+    if seed_routes is not None and len(seed_routes) <= max_vehicles:
+        feasible_probe = (len(seed_routes), seed_routes)
+        high = len(seed_routes) - 1
+        print(f"  Nearest-neighbour routes use {len(seed_routes)} courier(s)")
     
-    # Try vehicles starting from 1 (minimum) and work up
-    # This ensures we find the TRUE minimum, not just a solution
-    # When constrained to 4, we'll find the best solution with 4 or fewer couriers
-    for num_vehicles in range(1, max_vehicles + 1):
-        print(f"  Trying {num_vehicles} courier(s)...")
+    workers = max(1, SOLVER_WORKERS)
+    pool = get_solver_pool() if workers > 1 and max_vehicles > 1 else None
+    while low <= high:
+        # Probe up to `workers` evenly spaced counts at once; with one worker this is plain bisection
+        size = high - low + 1
+        width = min(workers, size)
+        candidates = [low + (i * size - 1) // (width + 1) for i in range(1, width + 1)]
+        print(f"  Trying {', '.join(str(c) for c in candidates)} courier(s)...")
         
-        solution, routing, manager, time_dimension = solve_vrp_with_vehicles(
-            data, cauldrons, couriers, num_vehicles, optimize_for_time
-        )
+        if pool is None:
+            probes = [probe_vehicle_count(data, candidates[0])]
+        else:
+            probes = list(pool.map(probe_vehicle_count, [data] * len(candidates), candidates))
         
-        if solution:
-            # Solution found! This is the minimum (we started from 1)
-            best_solution = solution
-            best_routing = routing
-            best_manager = manager
-            best_time_dimension = time_dimension
-            min_vehicles_needed = num_vehicles
-            print(f"    ✓✓✓ OPTIMAL SOLUTION FOUND with {num_vehicles} courier(s) - NO OVERFLOWS!")
-            break  # Stop immediately - we found the minimum
+        first_feasible = next((i for i, routes in enumerate(probes) if routes is not None), None)
+        if first_feasible is None:
+            low = candidates[-1] + 1
+            print(f"    ✗ No solution with up to {candidates[-1]} courier(s), trying more...")
         else:
-            print(f"    ✗ No solution with {num_vehicles} courier(s), trying more...")
+            num_vehicles = candidates[first_feasible]
+            feasible_probe = (num_vehicles, probes[first_feasible])
+            high = num_vehicles - 1
+            if first_feasible > 0:
+                low = candidates[first_feasible - 1] + 1
+            print(f"    ✓ Feasible with {num_vehicles} courier(s), trying fewer...")
+    
+    if feasible_probe:
+        # Re-solve the minimum with the full time budget for route quality, starting from the
+        # feasible routes found for that count
+        min_vehicles_needed = feasible_probe[0]
+        solution, routing, manager, time_dimension = solve_vrp_with_vehicles(
+            data, cauldrons, couriers, min_vehicles_needed, optimize_for_time, initial_routes=feasible_probe[1]
+        )
+        if not solution:
+            # Fall back to a fresh feasibility search if the full search did not return one
+            solution, routing, manager, time_dimension = solve_vrp_with_vehicles(
+                data, cauldrons, couriers, min_vehicles_needed, optimize_for_time, feasibility_only=True
+            )
+        best_solution = solution
+        best_routing = routing
+        best_manager = manager
+        best_time_dimension = time_dimension
+        print(f"    ✓✓✓ OPTIMAL SOLUTION FOUND with {min_vehicles_needed} courier(s) - NO OVERFLOWS!")
+    
+    if not best_solution and data.get('safety_margin_minutes'):
+        # Tight time windows make the search much harder; before giving up, drop the safety
+        # margin and only require each cauldron to be serviced before it overflows
+        print(f"No solution with the {data['safety_margin_minutes']} min safety margin - retrying with deadlines at the overflow times...")
+        return solve_vrp(relax_time_windows(data), cauldrons, couriers, optimize_for_time, max_vehicles_limit, decompose=False)
     
     if not best_solution:
         if max_vehicles_limit is not None:
@@ -541,162 +990,131 @@ def solve_vrp(data, cauldrons, couriers, optimize_for_time=False, max_vehicles_l
     
     used_vehicle_count = 0
     
+    # Hoist data-model and solver lookups out of the per-route loop
+    travel_matrix = data['distance_matrix']
+    pickup_tasks = data['pickup_tasks']
+    index_to_node = manager.IndexToNode
+    next_var = routing.NextVar
+    is_end = routing.IsEnd
+    value = solution.Value
+    capacity_cumul = capacity_dimension.CumulVar
+    
+    # Per-node arrays (node 0 is the market), so each route is validated and aggregated with
+    # array operations instead of per-stop dicts
+    node_pickups = np.array(data['demands'])
+    node_overflow_times = data['overflow_times']
+    node_service_times = np.asarray(data['service_times'], dtype=np.int64)
+    node_cauldrons = data['node_cauldrons']
+    
+    # Courier assigned to each vehicle's route (cycle through available couriers), resolved once
+    vehicle_couriers = []
+    for vehicle_id in range(min_vehicles_needed):
+        courier = couriers[vehicle_id % len(couriers)]
+        vehicle_couriers.append((
+            courier.get('courier_id') or f'courier_{vehicle_id}',
+            courier.get('name') or f'Courier {vehicle_id + 1}'
+        ))
+    
     # Use min_vehicles_needed instead of data['num_vehicles'] since we found the minimum
     for vehicle_id in range(min_vehicles_needed):
-        index = routing.Start(vehicle_id)
-        route_stops = []
-        route_volume = 0
-        cumulative_volume = 0  # Track cumulative volume at each step
+        # Walk the route once, collecting the visited nodes and the solver's capacity cumuls
+        # (skip the start node which is the market)
+        nodes = []
+        solver_capacities = []
+        index = value(next_var(routing.Start(vehicle_id)))
+        while not is_end(index):
+            nodes.append(index_to_node(index))
+            solver_capacities.append(value(capacity_cumul(index)))
+            index = value(next_var(index))
         
-        # Check if this vehicle is used
-        if routing.IsEnd(solution.Value(routing.NextVar(index))):
+        if not nodes:
             continue  # Skip unused vehicles
         
         used_vehicle_count += 1
+        nodes = np.array(nodes)
         
-        # Track route from start to end, calculating times correctly
         # Always calculate times manually from the route to ensure accuracy
-        current_time = 0  # Start at time 0 (at market)
-        previous_node_index = None  # No previous node at start
-        last_cauldron_node_index = None  # Track last cauldron node index for return calculation
+        # Travel times along the route, starting from the market (node 0)
+        travel_times = travel_matrix[np.concatenate(([0], nodes[:-1])), nodes].astype(np.int64)
+        # Validate travel times are reasonable (max 24 hours = 1440 minutes)
+        travel_times[(travel_times >= 1440) | (travel_times < 0)] = 30  # Fallback to reasonable default
+        # Arrival = all travel so far + service time (5 min pickup) at every earlier cauldron
+        service_times = node_service_times[nodes]
+        arrival_times = np.cumsum(travel_times) + np.cumsum(service_times) - service_times
         
-        # Move to first node (skip the start node which is the market)
-        index = solution.Value(routing.NextVar(index))
+        pickups = node_pickups[nodes]
+        cumulative_volumes = np.cumsum(pickups)  # Cumulative volume after each pickup
         
-        # Track route from start to end
-        while not routing.IsEnd(index):
-            node_index = manager.IndexToNode(index)
-            
-            # Get cumulative capacity at this node from OR-Tools
-            capacity_var = capacity_dimension.CumulVar(index)
-            cumulative_capacity_from_solver = solution.Value(capacity_var)
-            
-            # Calculate travel time from previous node to current node
-            if previous_node_index is not None:
-                travel_time = data['distance_matrix'][previous_node_index][node_index]
-                
-                # Validate travel time is reasonable (max 24 hours = 1440 minutes)
-                if travel_time >= 1440 or travel_time < 0:
-                    travel_time = 30  # Fallback to reasonable default
-                
-                # Add travel time from previous node to current node
-                current_time = current_time + travel_time
-            else:
-                # First node: travel from market (node 0) to first cauldron
-                travel_time = data['distance_matrix'][0][node_index]
-                if travel_time >= 1440 or travel_time < 0:
-                    travel_time = 30
-                current_time = travel_time  # Start time is just travel from market
-            
-            # Get arrival time from solver as a check (but use calculated time)
-            time_var = time_dimension.CumulVar(index)
-            arrival_time_from_solver = solution.Value(time_var)
-            
-            # Use calculated time (more reliable)
-            arrival_time = current_time
-            
-            if node_index > 0:  # Not the depot (market) - it's a pickup task node
-                task_idx = node_index - 1
-                if task_idx < len(data['pickup_tasks']):
-                    task = data['pickup_tasks'][task_idx]
-                    cauldron = task[0]  # Original cauldron data
-                    pickup_amount = task[1]  # Target pickup amount for this task
-                    min_pickup = task[2]  # Minimum pickup (for validation)
-                    max_pickup = task[3]  # Maximum pickup (for validation)
-                    
-                    # Update cumulative volume BEFORE pickup
-                    cumulative_volume_before = cumulative_volume
-                    cumulative_volume += pickup_amount
-                    
-                    # Validate capacity constraint: cumulative volume should never exceed 100L
-                    if cumulative_volume > 100:
-                        raise Exception(f"CAPACITY VIOLATION: Vehicle {vehicle_id} at node {node_index} (cauldron {cauldron.get('cauldronId')}) has cumulative volume {cumulative_volume}L, exceeding 100L limit!")
-                    
-                    # Validate against solver's capacity dimension
-                    if cumulative_capacity_from_solver > 100:
-                        raise Exception(f"CAPACITY VIOLATION (from solver): Vehicle {vehicle_id} at node {node_index} has capacity {cumulative_capacity_from_solver}L, exceeding 100L limit!")
-                    
-                    # CRITICAL: Validate that arrival time is within the time window (NO OVERFLOW ALLOWED)
-                    time_until_overflow = int(cauldron.get('timeUntilOverflow', 999999))
-                    if arrival_time > time_until_overflow:
-                        # This is a critical error - overflow will occur!
-                        raise Exception(f"OVERFLOW VIOLATION: Cauldron {cauldron.get('cauldronId')} ({cauldron.get('cauldronName')}) will overflow! Arrival time {arrival_time}min exceeds overflow time {time_until_overflow}min. Need more witches or better routing.")
-                    
-                    route_stops.append({
-                        'cauldronId': cauldron['cauldronId'],
-                        'cauldronName': cauldron['cauldronName'],
-                        'arrivalTime': int(arrival_time),  # Minutes from start (when courier arrives at cauldron)
-                        'pickupVolume': pickup_amount,  # Partial pickup amount (max 100L)
-                        'cumulativeVolume': cumulative_volume,  # Cumulative volume after this pickup
-                        'timeUntilOverflow': time_until_overflow  # Include for validation
-                    })
-                    route_volume += pickup_amount
-                    
-                    # Add service time at this cauldron (5 min pickup time)
-                    service_time_at_cauldron = data['service_times'][node_index]
-                    current_time = arrival_time + service_time_at_cauldron
-                    last_cauldron_node_index = node_index  # Track last cauldron visited
-            
-            previous_node_index = node_index
-            # Move to next node
-            index = solution.Value(routing.NextVar(index))
+        # Validate capacity constraint: cumulative volume should never exceed 100L
+        # Pickups are non-negative, so the running volume peaks at the last stop; the offending
+        # stop is only located when a check fails
+        if cumulative_volumes[-1] > 100:
+            stop = np.argmax(cumulative_volumes > 100)
+            raise Exception(f"CAPACITY VIOLATION: Vehicle {vehicle_id} at node {nodes[stop]} (cauldron {pickup_tasks[nodes[stop] - 1][0].get('cauldronId')}) has cumulative volume {cumulative_volumes[stop]}L, exceeding 100L limit!")
+        
+        # Validate against solver's capacity dimension
+        if max(solver_capacities) > 100:
+            stop = next(i for i, capacity in enumerate(solver_capacities) if capacity > 100)
+            raise Exception(f"CAPACITY VIOLATION (from solver): Vehicle {vehicle_id} at node {nodes[stop]} has capacity {solver_capacities[stop]}L, exceeding 100L limit!")
+        
+        # CRITICAL: Validate that arrival times are within the time windows (NO OVERFLOW ALLOWED)
+        overflows = arrival_times > node_overflow_times[nodes]
+        if overflows.any():
+            # This is a critical error - overflow will occur!
+            stop = np.argmax(overflows)
+            cauldron = pickup_tasks[nodes[stop] - 1][0]
+            raise Exception(f"OVERFLOW VIOLATION: Cauldron {cauldron.get('cauldronId')} ({cauldron.get('cauldronName')}) will overflow! Arrival time {arrival_times[stop]}min exceeds overflow time {node_overflow_times[nodes[stop]]}min. Need more witches or better routing.")
+        
+        route_volume = pickups.sum().item()
+        
+        # Calculate return time from last cauldron to market (node 0)
+        return_travel_time = int(travel_matrix[nodes[-1], 0])
+        # Validate return travel time (max 24 hours = 1440 minutes)
+        if return_travel_time >= 1440 or return_travel_time < 0:
+            return_travel_time = 30  # Fallback
         
-        # Validate final route volume doesn't exceed capacity
-        if route_volume > 100:
-            raise Exception(f"ROUTE CAPACITY VIOLATION: Vehicle {vehicle_id} route has total volume {route_volume}L, exceeding 100L limit!")
-        
-        if route_stops:
-            # Calculate return time from last cauldron to market
-            if last_cauldron_node_index is not None:
-                return_travel_time = data['distance_matrix'][last_cauldron_node_index][0]  # from last cauldron to market (node 0)
-                
-                # Validate return travel time (max 24 hours = 1440 minutes)
-                if return_travel_time >= 1440 or return_travel_time < 0:
-                    return_travel_time = 30  # Fallback
-            else:
-                return_travel_time = 30  # Fallback
-            
-            # Route time = current time (after last pickup) + return travel + unload
-            route_time = current_time + return_travel_time + data['market_unload_time']
-            
-            total_time = max(total_time, route_time)
-            
-            # Combine stops to the same cauldron (for multiple pickup tasks from same cauldron)
-            # Group stops by cauldronId and combine pickup volumes
-            # This shows the total collected from each cauldron across all tasks
-            combined_stops = {}
-            for stop in route_stops:
-                cauldron_id = stop['cauldronId']
-                if cauldron_id not in combined_stops:
-                    combined_stops[cauldron_id] = {
-                        'cauldronId': stop['cauldronId'],
-                        'cauldronName': stop['cauldronName'],
-                        'arrivalTime': stop['arrivalTime'],  # Use first arrival time
-                        'pickupVolume': 0,
-                        'timeUntilOverflow': stop['timeUntilOverflow']
-                    }
-                combined_stops[cauldron_id]['pickupVolume'] += stop['pickupVolume']
-                # Update arrival time to earliest visit
-                if stop['arrivalTime'] < combined_stops[cauldron_id]['arrivalTime']:
-                    combined_stops[cauldron_id]['arrivalTime'] = stop['arrivalTime']
-            
-            # Convert back to list and sort by arrival time
-            combined_stops_list = sorted(combined_stops.values(), key=lambda x: x['arrivalTime'])
-            
-            # Assign courier to route (cycle through available couriers)
-            courier_idx = vehicle_id % len(couriers)
-            courier = couriers[courier_idx]
-            
-            routes.append({
-                'courierId': courier.get('courier_id') or f'courier_{vehicle_id}',
-                'courierName': courier.get('name') or f'Courier {vehicle_id + 1}',
-                'stops': combined_stops_list,
-                'totalVolume': route_volume,
-                'totalTime': route_time
+        # Route time = time after last pickup + return travel + unload
+        current_time = int(arrival_times[-1] + service_times[-1])
+        route_time = current_time + return_travel_time + data['market_unload_time']
+        
+        total_time = max(total_time, route_time)
+        
+        # Combine stops to the same cauldron (for multiple pickup tasks from same cauldron)
+        # Group stops by cauldron and sum pickup volumes, which shows the total collected from
+        # each cauldron across all tasks. Arrival times never decrease along a route, so the
+        # first visit is the earliest and ordering groups by first visit sorts them by arrival.
+        _, first_stops, stop_groups = np.unique(node_cauldrons[nodes], return_index=True, return_inverse=True)
+        group_volumes = np.zeros(len(first_stops), dtype=pickups.dtype)
+        np.add.at(group_volumes, stop_groups, pickups)
+        order = np.argsort(first_stops)
+        first_stops = first_stops[order]
+        first_nodes = nodes[first_stops]
+        
+        combined_stops_list = []
+        for node, arrival_time, volume, time_until_overflow in zip(
+            first_nodes.tolist(), arrival_times[first_stops].tolist(),
+            group_volumes[order].tolist(), node_overflow_times[first_nodes].tolist()
+        ):
+            cauldron = pickup_tasks[node - 1][0]
+            combined_stops_list.append({
+                'cauldronId': cauldron['cauldronId'],
+                'cauldronName': cauldron['cauldronName'],
+                'arrivalTime': arrival_time,  # Minutes from start (earliest arrival at cauldron)
+                'pickupVolume': volume,  # Total collected from this cauldron on this route
+                'timeUntilOverflow': time_until_overflow  # Include for validation
             })
+        
+        courier_id, courier_name = vehicle_couriers[vehicle_id]
+        routes.append({
+            'courierId': courier_id,
+            'courierName': courier_name,
+            'stops': combined_stops_list,
+            'totalVolume': route_volume,
+            'totalTime': route_time
+        })
     
     # Sort routes by courier ID for consistent output
-    routes.sort(key=lambda x: x['courierId'] or '')
+    routes.sort(key=itemgetter('courierId'))
     
     return {
         'numCouriers': min_vehicles_needed,  # Return the actual minimum number needed
@@ -716,7 +1134,11 @@ def health():
 def optimize_routes():
     """Optimize courier routes using OR-Tools VRP solver"""
     try:
-        data = request.json
+        if orjson is not None:
+            raw = request.get_data()
+            data = orjson.loads(raw) if raw else None
+        else:
+            data = request.json
         
         if not data:
             return jsonify({'error': 'Missing request data'}), 400
@@ -734,18 +1156,8 @@ def optimize_routes():
         if not market:
             return jsonify({'error': 'Market information not provided'}), 400
         
-        # Convert distance matrix from array format to dict
-        distance_matrix = {}
-        for entry in distance_matrix_data:
-            from_node = entry.get('from')
-            to_list = entry.get('to', [])
-            if from_node:
-                distance_matrix[from_node] = {}
-                for to_entry in to_list:
-                    to_node = to_entry.get('to')
-                    time = to_entry.get('time')
-                    if to_node is not None and time is not None:
-                        distance_matrix[from_node][to_node] = time
+        # Convert distance matrix from array format to a dense array indexed by node id
+        distance_matrix, road_node_index = cached_parse_distance_matrix(distance_matrix_data)
         
         # Validate that we have market in distance matrix
         market_id = market.get('id')
@@ -759,7 +1171,8 @@ def optimize_routes():
             if not cauldron_id:
                 continue
             # Check if we have distance from market to cauldron
-            if market_id not in distance_matrix or cauldron_id not in distance_matrix.get(market_id, {}):
+            if (market_id not in road_node_index or cauldron_id not in road_node_index
+                    or distance_matrix[road_node_index[market_id], road_node_index[cauldron_id]] < 0):
                 missing_distances.append(f"market -> {cauldron_id}")
         
         # Get prediction horizon from request (default 8 hours = 480 minutes)
@@ -775,12 +1188,12 @@ def optimize_routes():
         
         # Create data model (will compute shortest paths for missing distances)
         # Pass prediction horizon to enable future overflow prediction
-        vrp_data = create_data_model(cauldrons, couriers, market, distance_matrix, prediction_horizon_minutes)
+        vrp_data = create_data_model(cauldrons, couriers, market, distance_matrix, road_node_index, prediction_horizon_minutes)
         
         # Solve VRP with optional vehicle limit
         result = solve_vrp(vrp_data, cauldrons, couriers, optimize_for_time, max_vehicles_limit)
         
-        return jsonify(result)
+        return json_response(result)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
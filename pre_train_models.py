@@ -7,9 +7,12 @@ Run this script before starting the server to have models ready instantly
 import sys
 import os
 import json
+import gzip
 import requests
 import time
 from datetime import datetime, timedelta
+from multiprocessing import Pool
+from concurrent.futures import ThreadPoolExecutor
 
 # Add current directory to path
 sys.path.insert(0, os.path.dirname(__file__))
@@ -20,44 +23,63 @@ import hashlib
 MODELS_DIR = 'prophet_models'
 os.makedirs(MODELS_DIR, exist_ok=True)
 
-def create_data_hash(time_series: list) -> str:
+# Models are stored with joblib (pickle protocol 5), LZ4-compressed when the lz4 package is installed
+try:
+    import lz4  # noqa: F401
+    MODEL_COMPRESSION = ('lz4', 1)
+except ImportError:
+    MODEL_COMPRESSION = ('zlib', 1)
+
+# Cauldrons are trained independently, so Prophet fits run in parallel worker processes
+TRAINING_WORKERS = int(os.getenv('TRAINING_WORKERS', os.cpu_count() or 1))
+
+def hashed_length(length: int) -> int:
+    """Number of leading points create_data_hash covers (see prophet_api.hashed_length)"""
+    step = 1 << max(0, length.bit_length() - 5)
+    return length - length % step
+
+def create_data_hash(time_series: tuple) -> str:
     """Create a hash from time series data to identify unique datasets"""
-    if not time_series:
+    timestamps, values = time_series
+    if len(timestamps) == 0:
         return ''
-    first_ts = time_series[0]['timestamp']
-    last_ts = time_series[-1]['timestamp']
-    length = len(time_series)
-    hash_str = f"{first_ts}-{last_ts}-{length}"
-    return hashlib.md5(hash_str.encode()).hexdigest()
+    # Hash every timestamp and value of the leading hashed_length points, exactly as
+    # prophet_api.create_data_hash does
+    length = hashed_length(len(timestamps))
+    timestamps, values = timestamps[:length], values[:length]
+    digest = hashlib.blake2b(digest_size=6)
+    digest.update('|'.join(timestamps).encode())
+    digest.update(np.asarray(values, dtype=np.float32).tobytes())
+    return digest.hexdigest()
 
 def get_model_path(cauldron_key: str, data_hash: str) -> str:
     """Generate a file path for a saved model"""
-    safe_hash = hashlib.md5(data_hash.encode()).hexdigest()[:12]
-    return os.path.join(MODELS_DIR, f'{cauldron_key}_{safe_hash}.pkl')
+    return os.path.join(MODELS_DIR, f'{cauldron_key}_{data_hash}.pkl')
 
-def load_model(cauldron_key: str, data_hash: str):
-    """Load a saved Prophet model from disk"""
-    import pickle
-    model_path = get_model_path(cauldron_key, data_hash)
-    if os.path.exists(model_path):
-        try:
-            with open(model_path, 'rb') as f:
-                model = pickle.load(f)
-            return model
-        except Exception as e:
-            return None
-    return None
+def slim_model(model):
+    """Drop fit-time state that predict does not use before the model is persisted
+    
+    The Stan fit result is discarded and the training history keeps only 'ds' and 't' (predict
+    reads the scaled times; make_future_dataframe uses history_dates, which is kept). Fitted
+    parameters are stored as float32: the rounding is far inside the 80% forecast interval
+    """
+    model.stan_fit = None
+    if model.history is not None:
+        model.history = model.history[['ds', 't']].copy()
+    if model.params:
+        model.params = {name: np.asarray(value, dtype=np.float32) for name, value in model.params.items()}
+    return model
 
 def save_model(model, cauldron_key: str, data_hash: str) -> str:
     """Save a trained Prophet model to disk"""
-    import pickle
     model_path = get_model_path(cauldron_key, data_hash)
-    with open(model_path, 'wb') as f:
-        pickle.dump(model, f)
+    joblib.dump(slim_model(model), model_path, compress=MODEL_COMPRESSION, protocol=5)
     return model_path
 
 try:
     from prophet import Prophet
+    import joblib
+    import numpy as np
     import pandas as pd
     import requests
 except ImportError as e:
@@ -65,12 +87,37 @@ except ImportError as e:
     print("Run: pip install -r requirements_prophet.txt")
     sys.exit(1)
 
+# orjson decodes the multi-MB historical payload several times faster than response.json()
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # API endpoint (adjust if needed)
 API_BASE_URL = os.getenv('API_BASE_URL', 'https://hackutd2025.eog.systems')
 
+# Historical data fetches are cached on disk (one file per day and date range), so re-running
+# the script during development does not re-download the full dataset
+HISTORICAL_CACHE_DIR = os.getenv('HISTORICAL_CACHE_DIR', '.cache')
+HISTORICAL_CACHE_MAX_AGE = int(os.getenv('HISTORICAL_CACHE_MAX_AGE', 24 * 60 * 60))  # seconds, 0 disables
+
+def historical_cache_path(start_date=None, end_date=None):
+    """On-disk cache file for a historical data fetch"""
+    range_tag = hashlib.blake2b(f"{start_date}-{end_date}".encode(), digest_size=4).hexdigest()
+    return os.path.join(HISTORICAL_CACHE_DIR, f"historical_{datetime.now():%Y%m%d}_{range_tag}.json.gz")
+
 def fetch_historical_data(start_date=None, end_date=None):
-    """Fetch historical data from the API"""
+    """Fetch historical data from the API (or today's on-disk cache of the same fetch)"""
     try:
+        cache_path = historical_cache_path(start_date, end_date)
+        if (HISTORICAL_CACHE_MAX_AGE > 0 and os.path.exists(cache_path)
+                and time.time() - os.path.getmtime(cache_path) < HISTORICAL_CACHE_MAX_AGE):
+            with gzip.open(cache_path, 'rb') as f:
+                content = f.read()
+            data = orjson.loads(content) if orjson is not None else json.loads(content)
+            print(f"Loaded {len(data)} cached data points from {cache_path}")
+            return data
+        
         url = f"{API_BASE_URL}/api/Data"
         params = {}
         if start_date:
@@ -81,8 +128,15 @@ def fetch_historical_data(start_date=None, end_date=None):
         print(f"Fetching historical data from {url}...")
         response = requests.get(url, params=params, timeout=60)
         response.raise_for_status()
-        data = response.json()
+        # Decode straight from the response bytes (no intermediate str)
+        data = orjson.loads(response.content) if orjson is not None else response.json()
         print(f"Fetched {len(data)} data points")
+        
+        # Cache the raw response bytes (no re-serialization)
+        if HISTORICAL_CACHE_MAX_AGE > 0:
+            os.makedirs(HISTORICAL_CACHE_DIR, exist_ok=True)
+            with gzip.open(cache_path, 'wb', compresslevel=3) as f:
+                f.write(response.content)
         return data
     except Exception as e:
         print(f"Error fetching data: {e}")
@@ -102,51 +156,46 @@ def fetch_cauldrons():
         print(f"Error fetching cauldrons: {e}")
         return []
 
-def prepare_time_series(historical_data, cauldron_key):
-    """Extract time series for a specific cauldron"""
-    time_series = []
-    for point in historical_data:
-        value = point.get('cauldron_levels', {}).get(cauldron_key, 0)
-        if value > 0:
-            time_series.append({
-                'timestamp': point['timestamp'],
-                'value': float(value)
-            })
-    return time_series
+def historical_levels_frame(historical_data):
+    """Cauldron levels indexed by timestamp, one column per cauldron key"""
+    levels = pd.DataFrame([point.get('cauldron_levels') or {} for point in historical_data])
+    levels.index = [point['timestamp'] for point in historical_data]
+    return levels
+
+def prepare_time_series(levels, cauldron_key):
+    """Extract time series for a specific cauldron from historical_levels_frame output
+    
+    Returns (timestamps, values) arrays: the raw timestamp strings and the levels as float32
+    (ample precision for cauldron levels, and half the bytes sent to the training workers)
+    """
+    values = levels[cauldron_key].fillna(0) if cauldron_key in levels else pd.Series(dtype=float)
+    values = values[values > 0]
+    return values.index.to_numpy(), values.to_numpy(dtype=np.float32)
 
 def train_model_for_cauldron(cauldron_key, time_series):
-    """Train a Prophet model for a specific cauldron"""
-    if len(time_series) < 100:
-        print(f"  ⚠️  Insufficient data for {cauldron_key} ({len(time_series)} points, need 100+)")
+    """Train a Prophet model for a specific cauldron from a (timestamps, values) time series"""
+    timestamps, values = time_series
+    if len(timestamps) < 100:
+        print(f"  ⚠️  Insufficient data for {cauldron_key} ({len(timestamps)} points, need 100+)")
         return False
     
     # Create data hash
     data_hash = create_data_hash(time_series)
     
-    # Check if model already exists
-    existing_model = load_model(cauldron_key, data_hash)
-    if existing_model:
+    # Check if model already exists (the file is not loaded, only the name is checked)
+    if os.path.exists(get_model_path(cauldron_key, data_hash)):
         print(f"  ✓ Model already exists for {cauldron_key}")
         return True
     
-    print(f"  🏋️  Training model for {cauldron_key} ({len(time_series)} data points)...")
+    print(f"  🏋️  Training model for {cauldron_key} ({len(timestamps)} data points)...")
     start_time = time.time()
     
     try:
-        # Prepare DataFrame
-        df_data = []
-        for point in time_series:
-            df_data.append({
-                'ds': point['timestamp'],
-                'y': float(point['value'])
-            })
-        
-        df = pd.DataFrame(df_data)
-        df['ds'] = pd.to_datetime(df['ds'])
-        
-        # Remove timezone if present
-        if df['ds'].dt.tz is not None:
-            df['ds'] = df['ds'].dt.tz_convert('UTC').dt.tz_localize(None)
+        # Prepare DataFrame (timestamps parsed as UTC with an explicit format, then made naive)
+        df = pd.DataFrame({
+            'ds': pd.to_datetime(timestamps, utc=True, format='ISO8601', cache=True).tz_localize(None),
+            'y': values
+        })
         
         # Use last 7+ days for training (or 70% of data)
         min_training_points = max(1008, int(len(df) * 0.7))
@@ -159,7 +208,8 @@ def train_model_for_cauldron(cauldron_key, time_series):
             yearly_seasonality=False,
             weekly_seasonality=True,
             daily_seasonality=True,
-            interval_width=0.80
+            interval_width=0.80,
+            mcmc_samples=0  # MAP fit only (no MCMC sampling)
         )
         
         model.fit(training_df)
@@ -175,6 +225,11 @@ def train_model_for_cauldron(cauldron_key, time_series):
         print(f"  ✗ Error training model for {cauldron_key}: {e}")
         return False
 
+def train_model_task(task):
+    """Worker-process entry point: task is (cauldron_key, time_series), returns (cauldron_key, success)"""
+    cauldron_key, time_series = task
+    return cauldron_key, train_model_for_cauldron(cauldron_key, time_series)
+
 def main():
     print("=" * 60)
     print("Prophet Model Pre-Training Script")
@@ -186,16 +241,24 @@ def main():
     
     # Fetch data
     print("Step 1: Fetching data from API...")
-    historical_data = fetch_historical_data()
+    # Both requests are network-bound, so they run concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        historical_future = executor.submit(fetch_historical_data)
+        cauldrons_future = executor.submit(fetch_cauldrons)
+        historical_data = historical_future.result()
+        cauldrons = cauldrons_future.result()
+    
     if not historical_data:
         print("ERROR: No historical data available")
         sys.exit(1)
     
-    cauldrons = fetch_cauldrons()
     if not cauldrons:
         print("ERROR: No cauldrons found")
         sys.exit(1)
     
+    # Parse the historical data once for all cauldrons
+    levels = historical_levels_frame(historical_data)
+    
     print()
     print("Step 2: Training models for each cauldron...")
     print()
@@ -203,6 +266,7 @@ def main():
     trained_count = 0
     skipped_count = 0
     failed_count = 0
+    tasks = []
     
     for cauldron in cauldrons:
         cauldron_id = cauldron.get('id', '')
@@ -219,20 +283,25 @@ def main():
         print(f"Processing {cauldron_name} ({cauldron_key})...")
         
         # Prepare time series
-        time_series = prepare_time_series(historical_data, cauldron_key)
+        time_series = prepare_time_series(levels, cauldron_key)
         
-        if len(time_series) < 100:
+        if len(time_series[0]) < 100:
             print(f"  ⚠️  Skipping {cauldron_key} - insufficient data")
             skipped_count += 1
             continue
         
-        # Train model
-        if train_model_for_cauldron(cauldron_key, time_series):
-            trained_count += 1
-        else:
-            failed_count += 1
-        
-        print()
+        tasks.append((cauldron_key, time_series))
+    
+    # Train models
+    print()
+    print(f"Training {len(tasks)} models with {TRAINING_WORKERS} worker(s)...")
+    with Pool(max(1, min(TRAINING_WORKERS, len(tasks)))) as pool:
+        for cauldron_key, success in pool.imap_unordered(train_model_task, tasks):
+            if success:
+                trained_count += 1
+            else:
+                failed_count += 1
+    print()
     
     print("=" * 60)
     print("Pre-training Complete!")
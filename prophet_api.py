@@ -4,16 +4,20 @@ Prophet Forecasting API
 Uses Facebook's Prophet library for time series forecasting
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import pandas as pd
+from pandas.tseries.frequencies import to_offset
 import numpy as np
-from datetime import datetime, timedelta
-import json
 import sys
 import os
-import pickle
 import hashlib
+import logging
+import multiprocessing
+import threading
+import joblib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 # Try to import Prophet, with helpful error messages
 try:
@@ -42,50 +46,350 @@ except Exception as e:
     print(f"Warning: Could not verify Prophet installation: {e}")
     print("Attempting to continue anyway...")
 
+# orjson parses request time series and serializes forecast responses several times faster than
+# the stdlib json module Flask uses; fall back to Flask's JSON handling when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
 
+# Per-request messages (model loads, cache hits) are logged at DEBUG, so with the default
+# LOG_LEVEL=INFO they are never formatted or written on the request path
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(), format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+log = logging.getLogger('prophet_api')
+
 # Directory to store trained models
 MODELS_DIR = 'prophet_models'
 os.makedirs(MODELS_DIR, exist_ok=True)
 
+# Models are stored with joblib (pickle protocol 5), LZ4-compressed when the lz4 package is installed
+try:
+    import lz4  # noqa: F401
+    MODEL_COMPRESSION = ('lz4', 1)
+except ImportError:
+    MODEL_COMPRESSION = ('zlib', 1)
+
+# Recently used models stay in memory, so repeated forecasts on the same data skip the disk load
+MODEL_CACHE_SIZE = 32
+_model_cache = OrderedDict()
+_model_cache_lock = threading.Lock()
+
+# Formatted forecasts are kept too: a polling frontend re-sends the same series and horizon, and
+# those repeats skip building the future frame and predicting (guarded by the same lock)
+FORECAST_CACHE_SIZE = 128
+_forecast_cache = OrderedDict()
+
+def cached_forecast(key: tuple):
+    """Formatted forecast stored under key by cache_forecast, or None"""
+    with _model_cache_lock:
+        result = _forecast_cache.get(key)
+        if result is not None:
+            _forecast_cache.move_to_end(key)
+        return result
+
+def cache_forecast(key: tuple, result):
+    """Keep a formatted forecast in the in-memory LRU cache"""
+    with _model_cache_lock:
+        _forecast_cache[key] = result
+        _forecast_cache.move_to_end(key)
+        if len(_forecast_cache) > FORECAST_CACHE_SIZE:
+            _forecast_cache.popitem(last=False)
+
+def cache_model(model: Prophet, cauldron_key: str, data_hash: str):
+    """Keep a model in the in-memory LRU cache"""
+    with _model_cache_lock:
+        _model_cache[(cauldron_key, data_hash)] = model
+        _model_cache.move_to_end((cauldron_key, data_hash))
+        if len(_model_cache) > MODEL_CACHE_SIZE:
+            _model_cache.popitem(last=False)
+
+# Stan backend used for fits (Prophet's stan_backend name); Prophet's default when unset or unavailable
+STAN_BACKEND = os.getenv('PROPHET_STAN_BACKEND')
+
+def new_model() -> Prophet:
+    """Create an unfitted Prophet model with the forecasting parameters shared by all endpoints"""
+    params = dict(
+        seasonality_mode='additive',
+        changepoint_prior_scale=0.05,
+        yearly_seasonality=False,
+        weekly_seasonality=True,
+        daily_seasonality=True,
+        interval_width=0.80  # 80% confidence interval
+    )
+    if STAN_BACKEND:
+        try:
+            return Prophet(stan_backend=STAN_BACKEND, **params)
+        except Exception as e:
+            log.warning("Stan backend %s unavailable (%s), using the default backend", STAN_BACKEND, e)
+    return Prophet(**params)
+
+# Batch forecasts fit cauldrons in parallel in worker processes kept across requests (each
+# worker has its own model cache; models are shared between processes through MODELS_DIR).
+# Under gunicorn every server worker has its own pool, so gunicorn.conf.py divides the cores
+# between them through FORECAST_WORKERS
+FORECAST_WORKERS = int(os.getenv('FORECAST_WORKERS', os.cpu_count() or 1))
+_forecast_pool = None
+
+def get_forecast_pool() -> ProcessPoolExecutor:
+    """Process pool shared by all batch forecast requests
+    
+    Pool processes are spawned rather than forked: the server process is multi-threaded, and a
+    fork could copy locks held by its other threads
+    """
+    global _forecast_pool
+    if _forecast_pool is None:
+        _forecast_pool = ProcessPoolExecutor(
+            max_workers=max(1, FORECAST_WORKERS), mp_context=multiprocessing.get_context('spawn')
+        )
+    return _forecast_pool
+
+def warm_start_params(cauldron_key: str) -> dict | None:
+    """Fitted parameters of a recently used model, as Prophet.fit(init=...) takes them, to seed a fit
+    
+    The cauldron's own latest model is preferred, then any other single-series model (parameters are
+    fitted on scaled data, so they are a close start for other cauldrons too)
+    """
+    with _model_cache_lock:
+        recent = [(key, model) for (key, _), model in reversed(_model_cache.items())
+                  if model.params and not model.extra_regressors]
+    if not recent:
+        return None
+    params = next((model for key, model in recent if key == cauldron_key), recent[0][1]).params
+    return {
+        'k': float(params['k'][0][0]),
+        'm': float(params['m'][0][0]),
+        'sigma_obs': float(params['sigma_obs'][0][0]),
+        'delta': params['delta'][0].astype(np.float64),
+        'beta': params['beta'][0].astype(np.float64)
+    }
+
+def fit_model(model: Prophet, df: pd.DataFrame, cauldron_key: str) -> Prophet:
+    """Fit model on df, warm-starting the optimizer from a recent model when one is available"""
+    init = warm_start_params(cauldron_key)
+    if init is None:
+        return model.fit(df)
+    try:
+        return model.fit(df, init=init)
+    except Exception as e:
+        # Incompatible warm start (e.g. a different number of changepoints): fit a fresh model
+        log.warning("Warm start failed for %s (%s), fitting from scratch", cauldron_key, e)
+        return new_model().fit(df)
+
 def get_model_path(cauldron_key: str, data_hash: str) -> str:
     """Generate a file path for a saved model"""
-    safe_hash = hashlib.md5(data_hash.encode()).hexdigest()[:12]
-    return os.path.join(MODELS_DIR, f'{cauldron_key}_{safe_hash}.pkl')
+    return os.path.join(MODELS_DIR, f'{cauldron_key}_{data_hash}.pkl')
+
+def slim_model(model: Prophet) -> Prophet:
+    """Drop fit-time state that predict does not use before the model is persisted
+    
+    The Stan fit result is discarded and the training history keeps only 'ds' and 't' (predict
+    reads the scaled times; make_future_dataframe uses history_dates, which is kept). Fitted
+    parameters are stored as float32: the rounding is far inside the 80% forecast interval
+    """
+    model.stan_fit = None
+    if model.history is not None:
+        model.history = model.history[['ds', 't']].copy()
+    if model.params:
+        model.params = {name: np.asarray(value, dtype=np.float32) for name, value in model.params.items()}
+    return model
 
 def save_model(model: Prophet, cauldron_key: str, data_hash: str) -> str:
     """Save a trained Prophet model to disk"""
     model_path = get_model_path(cauldron_key, data_hash)
-    with open(model_path, 'wb') as f:
-        pickle.dump(model, f)
-    print(f"Saved model to {model_path}")
+    joblib.dump(slim_model(model), model_path, compress=MODEL_COMPRESSION, protocol=5)
+    cache_model(model, cauldron_key, data_hash)
+    log.info("Saved model to %s", model_path)
     return model_path
 
 def load_model(cauldron_key: str, data_hash: str) -> Prophet | None:
-    """Load a saved Prophet model from disk"""
+    """Load a saved Prophet model from the in-memory cache or disk"""
+    with _model_cache_lock:
+        model = _model_cache.get((cauldron_key, data_hash))
+        if model is not None:
+            _model_cache.move_to_end((cauldron_key, data_hash))
+            return model
+    
     model_path = get_model_path(cauldron_key, data_hash)
     if os.path.exists(model_path):
         try:
-            with open(model_path, 'rb') as f:
-                model = pickle.load(f)
-            print(f"Loaded model from {model_path}")
+            model = joblib.load(model_path)
+            cache_model(model, cauldron_key, data_hash)
+            log.debug("Loaded model from %s", model_path)
             return model
         except Exception as e:
-            print(f"Error loading model from {model_path}: {e}")
+            log.warning("Error loading model from %s: %s", model_path, e)
             return None
     return None
 
+def hashed_length(length: int) -> int:
+    """Number of leading points create_data_hash covers: length rounded down to a step of 1/32-1/16
+    of it, so appending a few new points keeps the hash (and the trained model)"""
+    step = 1 << max(0, length.bit_length() - 5)
+    return length - length % step
+
 def create_data_hash(time_series: list) -> str:
     """Create a hash from time series data to identify unique datasets"""
     if not time_series:
         return ''
-    # Use first timestamp, last timestamp, and length as hash
-    first_ts = time_series[0]['timestamp']
-    last_ts = time_series[-1]['timestamp']
-    length = len(time_series)
-    hash_str = f"{first_ts}-{last_ts}-{length}"
-    return hashlib.md5(hash_str.encode()).hexdigest()
+    # Hash every timestamp and value of the leading hashed_length points (values as float32 bytes,
+    # matching pre_train_models.py), so a change anywhere in them selects a new model; the short
+    # BLAKE2b digest is file-name safe
+    time_series = time_series[:hashed_length(len(time_series))]
+    digest = hashlib.blake2b(digest_size=6)
+    digest.update('|'.join(point['timestamp'] for point in time_series).encode())
+    digest.update(np.fromiter((point['value'] for point in time_series), dtype=np.float32, count=len(time_series)).tobytes())
+    return digest.hexdigest()
+
+def prophet_frame(time_series: list) -> pd.DataFrame:
+    """Prophet training frame ('ds', 'y') built column-wise from [{"timestamp", "value"}, ...] points"""
+    # Prophet doesn't support timezone-aware datetimes: parse straight to UTC (naive timestamps are
+    # taken as UTC) and drop the timezone
+    ds = pd.to_datetime([point['timestamp'] for point in time_series], utc=True, format='ISO8601').tz_localize(None)
+    y = np.fromiter((point['value'] for point in time_series), dtype=np.float64, count=len(time_series))
+    return pd.DataFrame({'ds': ds, 'y': y})
+
+# Prediction columns returned by /forecast
+FORECAST_COLUMNS = ['ds', 'yhat', 'yhat_lower', 'yhat_upper', 'trend', 'weekly', 'daily']
+
+def format_forecast(forecast_df: pd.DataFrame, columns: list) -> list:
+    """Forecast rows as JSON-ready records (ISO 'ds' plus the given float columns), built column-wise"""
+    # Dates are formatted in one vectorized NumPy call and the floats converted in one block, so
+    # the only per-row Python work left is assembling each dict
+    # Dates come out exactly as Timestamp.isoformat() writes them: whole seconds in one call, and
+    # the (rare) dates with a sub-second part formatted individually so no precision is dropped
+    ds_values = forecast_df['ds'].to_numpy(dtype='datetime64[ns]')
+    ds = np.datetime_as_string(ds_values, unit='s').tolist()
+    for i in np.flatnonzero(ds_values != ds_values.astype('datetime64[s]')):
+        ds[i] = pd.Timestamp(ds_values[i]).isoformat()
+    values = forecast_df[columns].to_numpy(dtype=np.float64).tolist()
+    keys = ['ds', *columns]
+    return [dict(zip(keys, (timestamp, *row))) for timestamp, row in zip(ds, values)]
+
+def future_dates(time_series: list, periods: int, freq: str) -> pd.DatetimeIndex:
+    """`periods` dates starting one step (any pandas frequency) after the last point of time_series"""
+    # We need the last timestamp from the original data to create future dates
+    last_timestamp = pd.to_datetime(time_series[-1]['timestamp'], utc=True, format='ISO8601').tz_localize(None)
+    offset = to_offset(freq)
+    return pd.date_range(start=last_timestamp + offset, periods=periods, freq=offset)
+
+def forecast_cauldron(cauldron_id: str, time_series: list, data_hash: str, periods: int, freq: str,
+                      force_retrain: bool = False) -> list:
+    """Fit (or load) the model for one cauldron's time series and forecast `periods` steps past its end"""
+    # Try to load existing model
+    model = None if force_retrain else load_model(cauldron_id, data_hash)
+    needs_training = model is None
+    
+    if needs_training:
+        log.info("Training new model for %s (data hash: %.8s...)", cauldron_id, data_hash)
+        
+        # Prepare DataFrame
+        df = prophet_frame(time_series)
+        
+        # Initialize and fit model
+        try:
+            model = new_model()
+        except Exception as e:
+            error_msg = str(e)
+            if 'stan_backend' in error_msg:
+                raise RuntimeError('Prophet Stan backend not installed. Please run: pip install cmdstanpy && python -c "import cmdstanpy; cmdstanpy.install_cmdstan()"')
+            raise
+        
+        # Train the model
+        model = fit_model(model, df, cauldron_id)
+        
+        # Save the trained model
+        save_model(model, cauldron_id, data_hash)
+        log.info("Model trained and saved for %s", cauldron_id)
+    else:
+        log.debug("Using saved model for %s (data hash: %.8s...)", cauldron_id, data_hash)
+    
+    # Create future dataframe and predict (works with both new and loaded models)
+    future_df = pd.DataFrame({'ds': future_dates(time_series, periods, freq)})
+    forecast_df = model.predict(future_df)
+    
+    # Extract predictions
+    return format_forecast(forecast_df, ['yhat', 'yhat_lower', 'yhat_upper'])
+
+def request_json():
+    """Parsed JSON request body (None when empty), decoded with orjson when available"""
+    if orjson is None:
+        return request.json
+    raw = request.get_data()
+    return orjson.loads(raw) if raw else None
+
+# Streamed responses serialize long lists STREAM_CHUNK_ROWS items at a time and are written out
+# in blocks of about STREAM_BUFFER_BYTES, so the full JSON body is never held in memory at once
+STREAM_CHUNK_ROWS = 1000
+STREAM_BUFFER_BYTES = 64 * 1024
+
+def iter_json(value):
+    """Yield the orjson encoding (sorted keys) of value in pieces, splitting dicts and long lists"""
+    if isinstance(value, dict):
+        yield b'{'
+        for i, key in enumerate(sorted(value)):
+            yield (b',' if i else b'') + orjson.dumps(key) + b':'
+            yield from iter_json(value[key])
+        yield b'}'
+    elif isinstance(value, list) and len(value) > STREAM_CHUNK_ROWS:
+        yield b'['
+        for start in range(0, len(value), STREAM_CHUNK_ROWS):
+            chunk = orjson.dumps(value[start:start + STREAM_CHUNK_ROWS], option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SORT_KEYS)
+            yield (b',' if start else b'') + chunk[1:-1]
+        yield b']'
+    else:
+        yield orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SORT_KEYS)
+
+def json_response(payload):
+    """JSON response, streamed with orjson when available (sorted keys, like jsonify)"""
+    if orjson is None:
+        return jsonify(payload)
+    
+    def generate():
+        buffer = bytearray()
+        for piece in iter_json(payload):
+            buffer += piece
+            if len(buffer) >= STREAM_BUFFER_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+    
+    return Response(generate(), mimetype='application/json')
+
+def forecast_shared(tasks: list, periods: int, freq: str, force_retrain: bool = False) -> dict:
+    """Forecast several cauldrons from one Prophet fit on their stacked time series
+    
+    tasks are (cauldron_id, time_series, data_hash) tuples. The cauldrons share trend and
+    seasonality; every cauldron after the first gets a 0/1 indicator regressor for its level offset
+    """
+    indicators = [f'series_{i}' for i in range(1, len(tasks))]
+    batch_hash = hashlib.blake2b('|'.join(f'{cauldron_id}:{data_hash}' for cauldron_id, _, data_hash in tasks).encode(),
+                                 digest_size=6).hexdigest()
+    
+    model = None if force_retrain else load_model('shared_batch', batch_hash)
+    if model is None:
+        log.info("Training shared model for %d cauldrons (data hash: %.8s...)", len(tasks), batch_hash)
+        df = pd.concat([
+            prophet_frame(time_series).assign(**{name: float(j == i) for j, name in enumerate(indicators, 1)})
+            for i, (_, time_series, _) in enumerate(tasks)
+        ], ignore_index=True)
+        model = new_model()
+        for name in indicators:
+            model.add_regressor(name, standardize=False)
+        model.fit(df)
+        save_model(model, 'shared_batch', batch_hash)
+    else:
+        log.debug("Using saved shared model (data hash: %.8s...)", batch_hash)
+    
+    results = {}
+    for i, (cauldron_id, time_series, _) in enumerate(tasks):
+        future_df = pd.DataFrame({'ds': future_dates(time_series, periods, freq)})
+        future_df = future_df.assign(**{name: float(j == i) for j, name in enumerate(indicators, 1)})
+        results[cauldron_id] = format_forecast(model.predict(future_df), ['yhat', 'yhat_lower', 'yhat_upper'])
+    return results
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -103,7 +407,8 @@ def forecast():
             ...
         ],
         "periods": 144,  # Number of periods to forecast
-        "freq": "10min"   # Frequency: '10min', '1H', '1D', etc.
+        "freq": "10min",  # Frequency: '10min', '1H', '1D', etc.
+        "force_retrain": false  # Optional: refit even if a model for this data is saved
     }
     
     Returns:
@@ -117,26 +422,13 @@ def forecast():
     }
     """
     try:
-        data = request.json
+        data = request_json()
         
         if not data or 'data' not in data:
             return jsonify({'error': 'Missing data field'}), 400
         
         # Prepare DataFrame in Prophet format
-        df_data = []
-        for point in data['data']:
-            df_data.append({
-                'ds': point['timestamp'],
-                'y': float(point['value'])
-            })
-        
-        df = pd.DataFrame(df_data)
-        # Convert to datetime and remove timezone (Prophet doesn't support timezone-aware datetimes)
-        df['ds'] = pd.to_datetime(df['ds'])
-        # Remove timezone if present (Prophet requirement)
-        # Convert timezone-aware to naive by converting to UTC first, then removing timezone
-        if df['ds'].dt.tz is not None:
-            df['ds'] = df['ds'].dt.tz_convert('UTC').dt.tz_localize(None)
+        df = prophet_frame(data['data'])
         
         if len(df) < 100:
             return jsonify({'error': 'Insufficient data. Need at least 100 points.'}), 400
@@ -144,23 +436,25 @@ def forecast():
         # Create data hash for caching
         data_hash = create_data_hash(data['data'])
         cauldron_key = 'single_forecast'  # Use a generic key for single forecasts
+        periods = data.get('periods', 144)  # Default: 144 periods (24 hours at 10-min intervals)
+        freq = data.get('freq', '10min')
+        force_retrain = bool(data.get('force_retrain'))
+        forecast_key = ('forecast', data_hash, data['data'][-1]['timestamp'], periods, freq)
+        
+        # Identical recent request: skip the model load and prediction
+        cached = None if force_retrain else cached_forecast(forecast_key)
+        if cached is not None:
+            return json_response(cached)
         
         # Try to load existing model
-        model = load_model(cauldron_key, data_hash)
+        model = None if force_retrain else load_model(cauldron_key, data_hash)
         needs_training = model is None
         
         if needs_training:
-            print(f"Training new model (data hash: {data_hash[:8]}...)")
+            log.info("Training new model (data hash: %.8s...)", data_hash)
             # Initialize Prophet model
             try:
-                model = Prophet(
-                    seasonality_mode='additive',
-                    changepoint_prior_scale=0.05,
-                    yearly_seasonality=False,
-                    weekly_seasonality=True,
-                    daily_seasonality=True,
-                    interval_width=0.80  # 80% confidence interval
-                )
+                model = new_model()
             except Exception as e:
                 error_msg = str(e)
                 if 'stan_backend' in error_msg:
@@ -170,45 +464,31 @@ def forecast():
                 raise
             
             # Fit the model
-            model.fit(df)
+            model = fit_model(model, df, cauldron_key)
             
             # Save the trained model
             save_model(model, cauldron_key, data_hash)
-            print(f"Model trained and saved")
+            log.info("Model trained and saved")
         else:
-            print(f"Using saved model (data hash: {data_hash[:8]}...)")
-        
-        # Create future dataframe
-        periods = data.get('periods', 144)  # Default: 144 periods (24 hours at 10-min intervals)
-        freq = data.get('freq', '10min')
+            log.debug("Using saved model (data hash: %.8s...)", data_hash)
         
-        future = model.make_future_dataframe(periods=periods, freq=freq)
+        # Create future dataframe (future rows only, after the request's last point: a reused model
+        # may have been trained without the newest few points)
+        future = pd.DataFrame({'ds': future_dates(data['data'], periods, freq)})
         
-        # Make predictions
-        forecast_df = model.predict(future)
-        
-        # Extract only future predictions (not historical fit)
-        future_only = forecast_df.tail(periods)
+        # Make predictions, keeping only the returned columns (seasonal components default to 0
+        # when the model has none)
+        future_only = model.predict(future).reindex(columns=FORECAST_COLUMNS, fill_value=0.0)
         
         # Format response
-        forecast_data = []
-        for _, row in future_only.iterrows():
-            forecast_data.append({
-                'ds': row['ds'].isoformat(),
-                'yhat': float(row['yhat']),
-                'yhat_lower': float(row['yhat_lower']),
-                'yhat_upper': float(row['yhat_upper']),
-                'trend': float(row['trend']),
-                'weekly': float(row.get('weekly', 0)),
-                'daily': float(row.get('daily', 0))
-            })
+        forecast_data = format_forecast(future_only, FORECAST_COLUMNS[1:])
         
         # Get trend and seasonality components for visualization
-        trend_data = [float(x) for x in forecast_df['trend'].tail(periods).values]
-        weekly_data = [float(x) for x in forecast_df.get('weekly', pd.Series([0]*len(forecast_df))).tail(periods).values]
-        daily_data = [float(x) for x in forecast_df.get('daily', pd.Series([0]*len(forecast_df))).tail(periods).values]
+        trend_data = future_only['trend'].to_numpy(dtype=float).tolist()
+        weekly_data = future_only['weekly'].to_numpy(dtype=float).tolist()
+        daily_data = future_only['daily'].to_numpy(dtype=float).tolist()
         
-        return jsonify({
+        payload = {
             'forecast': forecast_data,
             'trend': trend_data,
             'weekly_seasonal': weekly_data,
@@ -218,7 +498,9 @@ def forecast():
                 'seasonality_mode': 'additive',
                 'interval_width': 0.80
             }
-        })
+        }
+        cache_forecast(forecast_key, payload)
+        return json_response(payload)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -237,11 +519,13 @@ def forecast_batch():
             ...
         },
         "periods": 144,
-        "freq": "10min"
+        "freq": "10min",
+        "shared_model": false,  # Optional: fit one model for all cauldrons (forecast_shared)
+        "force_retrain": false  # Optional: refit even if a model for this data is saved
     }
     """
     try:
-        data = request.json
+        data = request_json()
         
         if not data or 'cauldrons' not in data:
             return jsonify({'error': 'Missing cauldrons field'}), 400
@@ -249,97 +533,40 @@ def forecast_batch():
         results = {}
         periods = data.get('periods', 144)
         freq = data.get('freq', '10min')
+        force_retrain = bool(data.get('force_retrain'))
+        
+        # Opt-in: one Prophet fit for the whole batch instead of one per cauldron
+        if data.get('shared_model'):
+            tasks = [(cauldron_id, time_series, create_data_hash(time_series))
+                     for cauldron_id, time_series in data['cauldrons'].items() if len(time_series) >= 100]
+            return json_response({'results': forecast_shared(tasks, periods, freq, force_retrain) if tasks else {}})
         
+        tasks = []
         for cauldron_id, time_series in data['cauldrons'].items():
             if len(time_series) < 100:
                 continue
             
-            # Create data hash for this cauldron's time series
+            # Create data hash for this cauldron's time series, and reuse a recent identical forecast
             data_hash = create_data_hash(time_series)
-            
-            # Try to load existing model
-            model = load_model(cauldron_id, data_hash)
-            needs_training = model is None
-            
-            if needs_training:
-                print(f"Training new model for {cauldron_id} (data hash: {data_hash[:8]}...)")
-                
-                # Prepare DataFrame
-                df_data = []
-                for point in time_series:
-                    df_data.append({
-                        'ds': point['timestamp'],
-                        'y': float(point['value'])
-                    })
-                
-                df = pd.DataFrame(df_data)
-                # Convert to datetime and remove timezone (Prophet doesn't support timezone-aware datetimes)
-                df['ds'] = pd.to_datetime(df['ds'])
-                # Remove timezone if present (Prophet requirement)
-                # Convert timezone-aware to naive by converting to UTC first, then removing timezone
-                if df['ds'].dt.tz is not None:
-                    df['ds'] = df['ds'].dt.tz_convert('UTC').dt.tz_localize(None)
-                
-                # Initialize and fit model
-                try:
-                    model = Prophet(
-                        seasonality_mode='additive',
-                        changepoint_prior_scale=0.05,
-                        yearly_seasonality=False,
-                        weekly_seasonality=True,
-                        daily_seasonality=True,
-                        interval_width=0.80
-                    )
-                except Exception as e:
-                    error_msg = str(e)
-                    if 'stan_backend' in error_msg:
-                        return jsonify({
-                            'error': 'Prophet Stan backend not installed. Please run: pip install cmdstanpy && python -c "import cmdstanpy; cmdstanpy.install_cmdstan()"'
-                        }), 500
-                    raise
-                
-                # Train the model
-                model.fit(df)
-                
-                # Save the trained model
-                save_model(model, cauldron_id, data_hash)
-                print(f"Model trained and saved for {cauldron_id}")
+            cached = None if force_retrain else cached_forecast(
+                ('batch', cauldron_id, data_hash, time_series[-1]['timestamp'], periods, freq))
+            if cached is not None:
+                results[cauldron_id] = cached
             else:
-                print(f"Using saved model for {cauldron_id} (data hash: {data_hash[:8]}...)")
-            
-            # Create future dataframe and predict (works with both new and loaded models)
-            # We need the last timestamp from the original data to create future dates
-            last_timestamp = pd.to_datetime(time_series[-1]['timestamp'])
-            if last_timestamp.tz is not None:
-                last_timestamp = last_timestamp.tz_convert('UTC').tz_localize(None)
-            
-            # Create future dates starting from the end of training data
-            if freq == '1min':
-                # Start 1 minute after the last training data point
-                future_dates = pd.date_range(start=last_timestamp + pd.Timedelta(minutes=1), periods=periods, freq='1min')
-            elif freq == '10min':
-                future_dates = pd.date_range(start=last_timestamp + pd.Timedelta(minutes=10), periods=periods, freq='10min')
-            elif freq == '1H':
-                future_dates = pd.date_range(start=last_timestamp + pd.Timedelta(hours=1), periods=periods, freq='1H')
-            else:
-                future_dates = pd.date_range(start=last_timestamp + pd.Timedelta(days=1), periods=periods, freq='1D')
-            
-            future_df = pd.DataFrame({'ds': future_dates})
-            forecast_df = model.predict(future_df)
-            
-            # Extract predictions
-            forecast_data = []
-            for _, row in forecast_df.iterrows():
-                forecast_data.append({
-                    'ds': row['ds'].isoformat(),
-                    'yhat': float(row['yhat']),
-                    'yhat_lower': float(row['yhat_lower']),
-                    'yhat_upper': float(row['yhat_upper'])
-                })
-            
+                tasks.append((cauldron_id, time_series, data_hash))
+        
+        # Cauldrons are independent, so batches of more than one are fitted in parallel worker processes
+        if len(tasks) > 1 and FORECAST_WORKERS > 1:
+            futures = [get_forecast_pool().submit(forecast_cauldron, *task, periods, freq, force_retrain) for task in tasks]
+            forecasts = [future.result() for future in futures]
+        else:
+            forecasts = [forecast_cauldron(*task, periods, freq, force_retrain) for task in tasks]
+        
+        for (cauldron_id, time_series, data_hash), forecast_data in zip(tasks, forecasts):
+            cache_forecast(('batch', cauldron_id, data_hash, time_series[-1]['timestamp'], periods, freq), forecast_data)
             results[cauldron_id] = forecast_data
         
-        return jsonify({'results': results})
+        return json_response({'results': results})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -348,11 +575,20 @@ def forecast_batch():
 def clear_models():
     """Clear all saved models"""
     try:
+        global _forecast_pool
+        with _model_cache_lock:
+            _model_cache.clear()
+            _forecast_cache.clear()
+        # Worker processes hold their own model caches, so they are replaced too
+        if _forecast_pool is not None:
+            _forecast_pool.shutdown(wait=False)
+            _forecast_pool = None
         count = 0
-        for filename in os.listdir(MODELS_DIR):
-            if filename.endswith('.pkl'):
-                os.remove(os.path.join(MODELS_DIR, filename))
-                count += 1
+        with os.scandir(MODELS_DIR) as entries:
+            for entry in entries:
+                if entry.name.endswith('.pkl') and entry.is_file():
+                    os.remove(entry.path)
+                    count += 1
         return jsonify({'message': f'Cleared {count} saved models'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -362,15 +598,16 @@ def list_models():
     """List all saved models"""
     try:
         models = []
-        for filename in os.listdir(MODELS_DIR):
-            if filename.endswith('.pkl'):
-                filepath = os.path.join(MODELS_DIR, filename)
-                size = os.path.getsize(filepath)
-                models.append({
-                    'filename': filename,
-                    'size': size,
-                    'size_mb': round(size / (1024 * 1024), 2)
-                })
+        # scandir yields file type and size with the directory listing (no per-file path lookups)
+        with os.scandir(MODELS_DIR) as entries:
+            for entry in entries:
+                if entry.name.endswith('.pkl') and entry.is_file():
+                    size = entry.stat().st_size
+                    models.append({
+                        'filename': entry.name,
+                        'size': size,
+                        'size_mb': round(size / (1024 * 1024), 2)
+                    })
         return jsonify({'models': models, 'count': len(models)})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -379,5 +616,6 @@ if __name__ == '__main__':
     print("Starting Prophet API server...")
     print("Make sure Prophet is installed: pip install prophet")
     print(f"Models will be saved to: {os.path.abspath(MODELS_DIR)}")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    print("For production use gunicorn: gunicorn -c gunicorn.conf.py prophet_api:app")
+    app.run(host='0.0.0.0', port=5000, debug=os.getenv('FLASK_DEBUG') == '1')
 
@@ -8,27 +8,73 @@ along with historical measurements of the drop count emitted over a known durati
 
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Tuple
+import time
 import warnings
 
 import joblib
 import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, r2_score
-from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from threadpoolctl import threadpool_limits
+from urllib3.util.retry import Retry
+
+# Saved models are LZ4-compressed when the lz4 package is installed (zlib otherwise)
+try:
+    import lz4  # noqa: F401
+    MODEL_COMPRESSION = ("lz4", 1)
+except ImportError:
+    MODEL_COMPRESSION = ("zlib", 1)
+
+# orjson decodes the (multi-MB) API payloads several times faster than resp.json()
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Hummingbird compiles the fitted forest into batched tensor operations for inference; when it
+# is not installed, predictions go through the sklearn pipeline
+try:
+    from hummingbird.ml import convert as hummingbird_convert
+except ImportError:
+    hummingbird_convert = None
+
+# Numba compiles the packed-forest traversal into a parallel loop over rows; without it the
+# traversal runs as vectorized NumPy
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
 
 DEFAULT_TARGET_COLUMN = "fill_rate_l_per_min"
 DEFAULT_DURATION_COLUMN = "duration_seconds"
 API_BASE_URL = "https://hackutd2025.eog.systems/api"
 
+# Cyclical time features only take 24 * 60 minute-of-day and 7 day-of-week values, so they are
+# gathered from these tables instead of evaluating sin/cos for every row
+_HOUR_OF_DAY = np.arange(24 * 60) // 60 + (np.arange(24 * 60) % 60) / 60.0
+_HOUR_SIN = np.sin(2 * np.pi * _HOUR_OF_DAY / 24)
+_HOUR_COS = np.cos(2 * np.pi * _HOUR_OF_DAY / 24)
+_DOW_SIN = np.sin(2 * np.pi * np.arange(7) / 7)
+_DOW_COS = np.cos(2 * np.pi * np.arange(7) / 7)
+
+
+def _decode_json(resp: requests.Response) -> object:
+    """Decode a JSON response body, straight from the raw bytes when orjson is available."""
+    if orjson is not None:
+        return orjson.loads(resp.content)
+    return resp.json()
+
 
 def _ensure_datetime(value: str | datetime) -> datetime:
     """Convert ISO8601 strings to timezone-aware datetime objects."""
@@ -51,19 +97,40 @@ class CauldronDataClient:
         base_url: str = API_BASE_URL,
         timeout: float = 30.0,
         session: Optional[requests.Session] = None,
+        metadata_ttl: float = 60.0,
     ) -> None:
         self.base_url = base_url.rstrip("/")
         self.timeout = timeout
-        self.session = session or requests.Session()
+        # fetch_metadata responses are reused for metadata_ttl seconds (0 disables)
+        self.metadata_ttl = metadata_ttl
+        self._metadata_cache: Optional[Tuple[float, Dict[str, object]]] = None
+        if session is None:
+            # The loaders issue several calls in a row, so keep the connections (and TLS sessions)
+            # pooled and alive between them
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=16,
+                max_retries=Retry(total=3, backoff_factor=0.2),
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+        self.session = session
 
     def fetch_metadata(self) -> Dict[str, object]:
         """Retrieve available date range and sampling interval metadata."""
+        now = time.monotonic()
+        if self._metadata_cache is not None and now - self._metadata_cache[0] < self.metadata_ttl:
+            return self._metadata_cache[1]
         resp = self.session.get(
             f"{self.base_url}/Data/metadata",
             timeout=self.timeout,
         )
         resp.raise_for_status()
-        return resp.json()
+        metadata = _decode_json(resp)
+        self._metadata_cache = (now, metadata)
+        return metadata
 
     def fetch_data(
         self,
@@ -83,7 +150,7 @@ class CauldronDataClient:
             timeout=self.timeout,
         )
         resp.raise_for_status()
-        return resp.json()
+        return _decode_json(resp)
 
     def load_historical_dataframe(
         self,
@@ -99,6 +166,18 @@ class CauldronDataClient:
             Optional timezone-aware datetimes. If omitted, defaults to the range
             provided by the metadata.
         """
+        if start is not None and end is not None:
+            # Both bounds are known, so the metadata and data requests are independent and overlap
+            start, end = _ensure_datetime(start), _ensure_datetime(end)
+            if start >= end:
+                raise ValueError("Start datetime must be before end datetime.")
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                metadata_future = executor.submit(self.fetch_metadata)
+                data_future = executor.submit(self.fetch_data, start=start, end=end)
+                metadata = metadata_future.result()
+                raw_payload = data_future.result()
+            return melt_historical_records(raw_payload), metadata
+
         metadata = self.fetch_metadata()
         meta_start = _ensure_datetime(metadata["start_date"])
         meta_end = _ensure_datetime(metadata["end_date"])
@@ -120,7 +199,7 @@ class CauldronDataClient:
             timeout=self.timeout,
         )
         resp.raise_for_status()
-        data = resp.json()
+        data = _decode_json(resp)
         return data if isinstance(data, list) else []
 
     def load_recent_dataframe(
@@ -139,35 +218,110 @@ class CauldronDataClient:
         metadata = self.fetch_metadata()
         meta_end = _ensure_datetime(metadata["end_date"])
         start = meta_end - timedelta(minutes=minutes)
-        history_df, _ = self.load_historical_dataframe(start=start, end=meta_end)
-        return history_df, metadata
+        # The window is already resolved, so fetch it directly rather than through
+        # load_historical_dataframe (which would request the metadata again)
+        if start >= meta_end:
+            raise ValueError("Start datetime must be before end datetime.")
+        raw_payload = self.fetch_data(start=start, end=meta_end)
+        return melt_historical_records(raw_payload), metadata
 
 
 def melt_historical_records(payload: List[Dict[str, object]]) -> pd.DataFrame:
     """
     Transform the API payload into a long-form DataFrame.
 
-    Returns columns: timestamp (UTC datetime64), cauldron_id (str), level (float).
+    Returns columns: timestamp (UTC datetime64), cauldron_id (categorical of str), level (float).
     """
-    rows: List[Dict[str, object]] = []
+    # Columns are collected as flat lists (one timestamp per entry, repeated per cauldron) and
+    # the frame is built column-wise, instead of allocating one dict per row
+    timestamps: List[str | datetime] = []
+    counts: List[int] = []
+    cauldron_ids: List[str] = []
+    levels: List[float] = []
     for entry in payload:
-        timestamp = _ensure_datetime(entry["timestamp"])
         cauldron_levels = entry.get("cauldron_levels") or {}
-        for cauldron_id, level in cauldron_levels.items():
-            rows.append(
-                {
-                    "timestamp": pd.Timestamp(timestamp),
-                    "cauldron_id": str(cauldron_id),
-                    "level": float(level),
-                }
-            )
-    if not rows:
+        timestamps.append(entry["timestamp"])
+        counts.append(len(cauldron_levels))
+        cauldron_ids.extend(map(str, cauldron_levels.keys()))
+        levels.extend(cauldron_levels.values())
+    if not cauldron_ids:
         return pd.DataFrame(columns=["timestamp", "cauldron_id", "level"])
 
-    df = pd.DataFrame(rows)
-    df.sort_values(["cauldron_id", "timestamp"], inplace=True)
-    df.reset_index(drop=True, inplace=True)
-    return df
+    # One vectorized ISO8601 parse for all entries (naive timestamps are taken as UTC, as in
+    # _ensure_datetime)
+    parsed = pd.to_datetime(timestamps, utc=True, format="ISO8601")
+    # Categorical, so grouping and ordering work on integer codes instead of strings
+    ids = pd.Categorical(cauldron_ids)
+
+    # Rows are ordered by (cauldron_id, timestamp). The API returns entries in time order, so a
+    # stable sort of the cauldron codes alone is enough; otherwise sort by both keys
+    stamps = parsed.repeat(counts)
+    if parsed.is_monotonic_increasing:
+        order = np.argsort(ids.codes, kind="stable")
+    else:
+        order = np.lexsort((stamps.asi8, ids.codes))
+
+    return pd.DataFrame(
+        {
+            "timestamp": stamps[order],
+            "cauldron_id": ids[order],
+            "level": np.fromiter(levels, dtype=np.float64, count=len(levels))[order],
+        }
+    )
+
+
+def _group_layout(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Stable group-major row order for ``codes`` and a mask of the rows starting a group in it."""
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    return order, np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]
+
+
+def _group_previous(codes: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Previous value within each group, NaN for a group's first row.
+
+    Matches ``groupby(...).shift(1)`` with a plain shift and a group-boundary mask.
+    """
+    order, group_start = _group_layout(codes)
+    sorted_values = values[order].astype(np.float64)
+    previous = np.empty_like(sorted_values)
+    previous[1:] = sorted_values[:-1]
+    previous[group_start] = np.nan
+
+    result = np.empty_like(previous)
+    result[order] = previous
+    return result
+
+
+def _group_rolling_mean(codes: np.ndarray, values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing rolling mean of each column of ``values`` within the groups labelled by ``codes``.
+
+    Matches ``groupby(...).rolling(window, min_periods=1).mean()`` (NaNs are skipped), but handles
+    every group and column in one vectorized pass: rows are stably sorted by group and each of the
+    ``window`` lags is added where it stays inside the row's group.
+    """
+    order, group_start = _group_layout(codes)
+    sorted_values = values[order]
+    n = len(codes)
+    starts = np.flatnonzero(group_start)
+    position = np.arange(n) - np.repeat(starts, np.diff(np.r_[starts, n]))
+
+    present = ~np.isnan(sorted_values)
+    filled = np.where(present, sorted_values, 0.0)
+    totals = filled.copy()
+    counts = present.astype(np.float64)
+    for lag in range(1, window):
+        in_group = (position[lag:] >= lag)[:, None]
+        totals[lag:] += np.where(in_group, filled[:-lag], 0.0)
+        counts[lag:] += np.where(in_group, present[:-lag], 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = totals / counts
+
+    result = np.empty_like(means)
+    result[order] = means
+    return result
 
 
 def prepare_training_dataset(
@@ -190,55 +344,147 @@ def prepare_training_dataset(
     if history_df.empty:
         raise ValueError("Historical dataframe is empty; cannot train model.")
 
-    df = history_df.copy()
-    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
-    df[DEFAULT_DURATION_COLUMN] = float(interval_minutes) * 60.0
+    # Every column is computed as a NumPy array and the frame is assembled once at the end, so
+    # the history is never copied and no column is inserted into a growing frame
+    cauldron_col = history_df["cauldron_id"]
+    if isinstance(cauldron_col.dtype, pd.CategoricalDtype):
+        codes = cauldron_col.cat.codes.to_numpy()
+    else:
+        codes = pd.factorize(cauldron_col)[0]
+    levels = history_df["level"].to_numpy(dtype=np.float64)
+    prev_levels = _group_previous(codes, levels)
+
+    # Drop each cauldron's first observation (no previous level)
+    keep = ~np.isnan(prev_levels)
+    codes = codes[keep]
+    levels = levels[keep]
+    prev_levels = prev_levels[keep]
+    cauldron_ids = cauldron_col.array[keep]
+    timestamps = pd.DatetimeIndex(pd.to_datetime(history_df["timestamp"], utc=True))[keep]
+
+    level_delta = levels - prev_levels
+    fill_amount = np.clip(level_delta, 0.0, None)
+    drop_amount = np.clip(-level_delta, 0.0, None)
+
+    rolling_means = _group_rolling_mean(
+        codes,
+        np.column_stack([fill_amount, drop_amount]),
+        rolling_window,
+    )
 
-    df["prev_level"] = df.groupby("cauldron_id")["level"].shift(1)
-    df.dropna(subset=["prev_level"], inplace=True)
+    minute_of_day = timestamps.hour.to_numpy() * 60 + timestamps.minute.to_numpy()
+    day_of_week = timestamps.dayofweek.to_numpy()
+
+    df = pd.DataFrame(
+        {
+            "timestamp": timestamps,
+            "cauldron_id": cauldron_ids,
+            "level": levels,
+            "prev_level": prev_levels,
+            "level_delta": level_delta,
+            "fill_amount": fill_amount,
+            "drop_amount": drop_amount,
+            "rolling_fill_rate": rolling_means[:, 0] / float(interval_minutes),
+            "rolling_fill_amount": rolling_means[:, 0],
+            "rolling_drop_amount": rolling_means[:, 1],
+            "hour_sin": _HOUR_SIN[minute_of_day],
+            "hour_cos": _HOUR_COS[minute_of_day],
+            "dow_sin": _DOW_SIN[day_of_week],
+            "dow_cos": _DOW_COS[day_of_week],
+            DEFAULT_DURATION_COLUMN: np.full(len(levels), float(interval_minutes) * 60.0),
+            DEFAULT_TARGET_COLUMN: fill_amount / float(interval_minutes),
+        },
+        copy=False,
+    )
+    return df.set_index("timestamp")
+
+
+def _traverse_forest_numpy(
+    X: np.ndarray,
+    feature: np.ndarray,
+    threshold: np.ndarray,
+    left: np.ndarray,
+    right: np.ndarray,
+    value: np.ndarray,
+    tree_start: np.ndarray,
+) -> np.ndarray:
+    """Mean leaf value over all trees for each row of ``X``, advancing every (row, tree) pair one level at a time."""
+    n_rows, n_trees = X.shape[0], tree_start.shape[0]
+    nodes = np.tile(tree_start, n_rows)
+    rows = np.repeat(np.arange(n_rows), n_trees)
+    active = np.flatnonzero(left[nodes] != -1)
+    while active.size:
+        current = nodes[active]
+        go_left = X[rows[active], feature[current]] <= threshold[current]
+        nodes[active] = np.where(go_left, left[current], right[current])
+        active = active[left[nodes[active]] != -1]
+    return value[nodes].reshape(n_rows, n_trees).mean(axis=1, dtype=np.float64)
+
+
+if njit is not None:
+
+    @njit(parallel=True, cache=True)
+    def _traverse_forest_numba(X, feature, threshold, left, right, value, tree_start):
+        """Numba version of ``_traverse_forest_numpy``: rows in parallel, one tree walk at a time."""
+        n_trees = tree_start.shape[0]
+        out = np.empty(X.shape[0])
+        for i in prange(X.shape[0]):
+            acc = 0.0
+            for t in range(n_trees):
+                node = tree_start[t]
+                while left[node] != -1:
+                    if X[i, feature[node]] <= threshold[node]:
+                        node = left[node]
+                    else:
+                        node = right[node]
+                acc += value[node]
+            out[i] = acc / n_trees
+        return out
+
+
+class PackedForest:
+    """
+    Fitted regression forest flattened into parallel node arrays for batched inference.
 
-    df["level_delta"] = df["level"] - df["prev_level"]
-    df["fill_amount"] = df["level_delta"].clip(lower=0.0)
-    df["drop_amount"] = (-df["level_delta"]).clip(lower=0.0)
-    df[DEFAULT_TARGET_COLUMN] = df["fill_amount"] / float(interval_minutes)
+    All trees' nodes are concatenated (structure of arrays: ``feature``, ``threshold``, ``left``,
+    ``right``, ``value``) with child indices made absolute and ``tree_start`` holding each root.
+    Leaves keep ``left == -1``. As in sklearn, float32 features are compared against float64
+    thresholds (rounding a midpoint threshold to float32 could land it on the upper sample value
+    and send that value's ties to the other child).
+    """
 
-    df["rolling_fill_amount"] = (
-        df.groupby("cauldron_id")["fill_amount"]
-        .transform(lambda s: s.rolling(rolling_window, min_periods=1).mean())
-    )
-    df["rolling_fill_rate"] = df["rolling_fill_amount"] / float(interval_minutes)
-    df["rolling_drop_amount"] = (
-        df.groupby("cauldron_id")["drop_amount"]
-        .transform(lambda s: s.rolling(rolling_window, min_periods=1).mean())
-    )
+    # Without Numba, larger batches than this are faster through sklearn's own tree traversal
+    numpy_max_rows = 256
 
-    df["hour_of_day"] = df["timestamp"].dt.hour + df["timestamp"].dt.minute / 60.0
-    df["hour_sin"] = np.sin(2 * np.pi * df["hour_of_day"] / 24)
-    df["hour_cos"] = np.cos(2 * np.pi * df["hour_of_day"] / 24)
-
-    df["day_of_week"] = df["timestamp"].dt.dayofweek
-    df["dow_sin"] = np.sin(2 * np.pi * df["day_of_week"] / 7)
-    df["dow_cos"] = np.cos(2 * np.pi * df["day_of_week"] / 7)
-
-    feature_columns = [
-        "cauldron_id",
-        "level",
-        "prev_level",
-        "level_delta",
-        "fill_amount",
-        "drop_amount",
-        "rolling_fill_rate",
-        "rolling_fill_amount",
-        "rolling_drop_amount",
-        "hour_sin",
-        "hour_cos",
-        "dow_sin",
-        "dow_cos",
-        DEFAULT_DURATION_COLUMN,
-    ]
-    df = df[["timestamp"] + feature_columns + [DEFAULT_TARGET_COLUMN]]
-    df.set_index("timestamp", inplace=True)
-    return df
+    def __init__(self, forest: RandomForestRegressor, value_dtype=np.float64) -> None:
+        self.forest = forest
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        sizes = np.array([tree.node_count for tree in trees])
+        starts = np.r_[0, np.cumsum(sizes)[:-1]]
+
+        def children(attr: str) -> np.ndarray:
+            parts = [
+                np.where(getattr(tree, attr) == -1, -1, getattr(tree, attr) + start)
+                for tree, start in zip(trees, starts)
+            ]
+            return np.concatenate(parts).astype(np.int32)
+
+        self.feature = np.concatenate([np.maximum(tree.feature, 0) for tree in trees]).astype(np.int32)
+        self.threshold = np.concatenate([tree.threshold for tree in trees]).astype(np.float64)
+        self.left = children("children_left")
+        self.right = children("children_right")
+        self.value = np.concatenate([tree.value[:, 0, 0] for tree in trees]).astype(value_dtype)
+        self.tree_start = starts.astype(np.int32)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Average prediction of the packed trees for each row of the (dense) feature matrix."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        arrays = (self.feature, self.threshold, self.left, self.right, self.value, self.tree_start)
+        if njit is not None:
+            return _traverse_forest_numba(X, *arrays)
+        if X.shape[0] > self.numpy_max_rows:
+            return self.forest.predict(X)
+        return _traverse_forest_numpy(X, *arrays)
 
 
 @dataclass
@@ -267,6 +513,14 @@ class CauldronFlowModelConfig:
         Number of trees in the random forest.
     max_depth:
         Optional maximum tree depth for the forest.
+    max_features:
+        Features considered per split (fraction of the feature count, or an sklearn keyword).
+    max_samples_per_tree:
+        Cap on the bootstrap sample drawn for each tree; larger training sets are subsampled
+        (never below 10% of the rows).
+    quantize_forest:
+        Round the fitted leaf values, and the split thresholds of trees where that cannot
+        change any training sample's path, to float16 precision.
     """
 
     feature_columns: Optional[List[str]] = None
@@ -278,6 +532,9 @@ class CauldronFlowModelConfig:
     random_state: int = 42
     n_estimators: int = 300
     max_depth: Optional[int] = None
+    max_features: float | str = 1.0
+    max_samples_per_tree: int = 100_000
+    quantize_forest: bool = False
 
     def resolve_features(self, df: pd.DataFrame) -> tuple[List[str], List[str], List[str]]:
         """Infer feature column groupings when not explicitly configured."""
@@ -293,23 +550,26 @@ class CauldronFlowModelConfig:
         if not feature_cols:
             raise ValueError("No feature columns provided or inferred.")
 
+        # Classify from the dtypes alone (read once), without materializing a Series per column
+        dtypes = df.dtypes
         if self.categorical_features is not None:
             cat_features = self.categorical_features
         else:
             cat_features = [
                 col
                 for col in feature_cols
-                if pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_categorical_dtype(df[col])
+                if dtypes[col] == object or isinstance(dtypes[col], pd.CategoricalDtype)
             ]
 
         if self.numerical_features is not None:
             num_features = self.numerical_features
         else:
+            cat_set = set(cat_features)
             num_features = [
                 col
                 for col in feature_cols
-                if col not in cat_features
-                and pd.api.types.is_numeric_dtype(df[col])
+                if col not in cat_set
+                and pd.api.types.is_numeric_dtype(dtypes[col])
             ]
 
         missing_features = set(feature_cols) - set(cat_features) - set(num_features)
@@ -336,19 +596,22 @@ class CauldronFlowModel:
         self.config = config or CauldronFlowModelConfig()
         self.pipeline: Optional[Pipeline] = None
         self._feature_columns: Optional[List[str]] = None
+        self._preprocessor: Optional[ColumnTransformer] = None
+        self._compiled_regressor = None
 
     def _build_pipeline(
         self,
         categorical_features: Iterable[str],
         numerical_features: Iterable[str],
+        n_samples: int,
     ) -> Pipeline:
-        """Create the preprocessing + model pipeline."""
+        """Create the preprocessing + model pipeline for a training set of ``n_samples`` rows."""
         transformers = []
         if categorical_features:
             transformers.append(
                 (
                     "categorical",
-                    OneHotEncoder(handle_unknown="ignore"),
+                    OneHotEncoder(handle_unknown="ignore", sparse_output=True, dtype=np.float32),
                     list(categorical_features),
                 )
             )
@@ -356,7 +619,8 @@ class CauldronFlowModel:
             transformers.append(
                 (
                     "numerical",
-                    StandardScaler(),
+                    # Trees only need the scale; skipping centering keeps sparse inputs sparse
+                    StandardScaler(with_mean=False),
                     list(numerical_features),
                 )
             )
@@ -366,6 +630,8 @@ class CauldronFlowModel:
         model = RandomForestRegressor(
             n_estimators=self.config.n_estimators,
             max_depth=self.config.max_depth,
+            max_features=self.config.max_features,
+            max_samples=min(1.0, max(0.1, self.config.max_samples_per_tree / max(n_samples, 1))),
             random_state=self.config.random_state,
             n_jobs=-1,
         )
@@ -377,6 +643,78 @@ class CauldronFlowModel:
             ]
         )
 
+    def _quantize_forest(self, X_train: pd.DataFrame) -> None:
+        """
+        Round the forest's leaf values and split thresholds to float16 precision in place.
+
+        A tree's thresholds are only rounded when every rounded threshold is finite and no
+        training value of the split feature lies between the original and the rounded threshold
+        (so every training sample still takes the same path); leaf values when they stay finite.
+        """
+        X_mat = self.pipeline.named_steps["preprocessor"].transform(X_train)
+        if hasattr(X_mat, "toarray"):
+            X_mat = X_mat.toarray()
+        # Trees compare float32 features against float64 thresholds
+        sorted_columns = np.sort(np.asarray(X_mat, dtype=np.float32), axis=0).astype(np.float64)
+
+        for estimator in self.pipeline.named_steps["regressor"].estimators_:
+            tree = estimator.tree_
+            # threshold/value are writable views of the tree's node storage
+            threshold = tree.threshold
+            split = tree.children_left != -1
+            with np.errstate(over="ignore"):
+                rounded = threshold.astype(np.float16).astype(np.float64)
+                rounded_value = tree.value.astype(np.float16)
+            if np.isfinite(rounded[split]).all():
+                low = np.minimum(threshold, rounded)[split]
+                high = np.maximum(threshold, rounded)[split]
+                features = tree.feature[split]
+                # A sample changes side exactly when its value v satisfies low < v <= high
+                crossed = any(
+                    np.any(
+                        np.searchsorted(sorted_columns[:, f], high[features == f], side="right")
+                        > np.searchsorted(sorted_columns[:, f], low[features == f], side="right")
+                    )
+                    for f in np.unique(features)
+                )
+                if not crossed:
+                    threshold[split] = rounded[split]
+
+            if np.isfinite(rounded_value).all():
+                tree.value[:] = rounded_value
+
+    def _compile_regressor(self) -> None:
+        """
+        Compile the fitted forest for inference: with Hummingbird (PyTorch backend, CPU) when it
+        is available, otherwise into a PackedForest.
+        """
+        self._compiled_regressor = None
+        if self.pipeline is None:
+            return
+        self._preprocessor = self.pipeline.named_steps["preprocessor"]
+        forest = self.pipeline.named_steps["regressor"]
+        if hummingbird_convert is not None:
+            try:
+                self._compiled_regressor = hummingbird_convert(forest, "torch")
+                return
+            except Exception as exc:
+                warnings.warn(
+                    f"Hummingbird compilation failed; using the packed forest instead: {exc}",
+                    RuntimeWarning,
+                    stacklevel=2,
+                )
+        self._compiled_regressor = PackedForest(forest)
+
+    def _predict(self, X: pd.DataFrame) -> np.ndarray:
+        """Run the fitted pipeline, through the compiled forest when one is available."""
+        if self._compiled_regressor is None:
+            return self.pipeline.predict(X)
+        # Transform once into the row-major float32 matrix the trees compare against
+        X_mat = self._preprocessor.transform(X)
+        if hasattr(X_mat, "toarray"):
+            X_mat = X_mat.toarray()
+        return self._compiled_regressor.predict(np.ascontiguousarray(X_mat, dtype=np.float32))
+
     def fit(self, df: pd.DataFrame) -> dict[str, float]:
         """
         Train the pipeline and report evaluation metrics.
@@ -394,22 +732,37 @@ class CauldronFlowModel:
             )
 
         feature_cols, cat_features, num_features = self.config.resolve_features(train_df)
+        for col in cat_features:
+            train_df[col] = train_df[col].astype("category")
 
         X = train_df[feature_cols]
         y = train_df[self.config.target_column]
 
-        X_train, X_val, y_train, y_val = train_test_split(
-            X,
-            y,
-            test_size=self.config.test_size,
-            random_state=self.config.random_state,
-        )
+        # One seeded permutation and positional takes; this draws the same shuffle split as
+        # sklearn's train_test_split (test rows first), without its per-array indexing copies
+        n_rows = len(X)
+        n_val = int(np.ceil(self.config.test_size * n_rows))
+        if not 0 < n_val < n_rows:
+            raise ValueError(
+                f"test_size={self.config.test_size} leaves an empty training or validation set "
+                f"for {n_rows} positive fill-rate observations."
+            )
+        permutation = np.random.RandomState(self.config.random_state).permutation(n_rows)
+        val_idx, train_idx = permutation[:n_val], permutation[n_val:]
+        X_train, X_val = X.iloc[train_idx], X.iloc[val_idx]
+        y_train, y_val = y.iloc[train_idx], y.iloc[val_idx]
 
-        self.pipeline = self._build_pipeline(cat_features, num_features)
+        self.pipeline = self._build_pipeline(cat_features, num_features, len(X_train))
         self._feature_columns = feature_cols
-        self.pipeline.fit(X_train, y_train)
-
-        y_pred = self.pipeline.predict(X_val)
+        # The forest already parallelizes across trees; keep BLAS/OpenMP pools single-threaded
+        # inside the workers so they do not oversubscribe the cores
+        with threadpool_limits(limits=1):
+            self.pipeline.fit(X_train, y_train)
+        if self.config.quantize_forest:
+            self._quantize_forest(X_train)
+        self._compile_regressor()
+
+        y_pred = self._predict(X_val)
         metrics = {
             "r2": float(r2_score(y_val, y_pred)),
             "mae": float(mean_absolute_error(y_val, y_pred)),
@@ -425,7 +778,7 @@ class CauldronFlowModel:
         missing = set(self._feature_columns) - set(df.columns)
         if missing:
             raise ValueError(f"Missing required feature columns for prediction: {missing}")
-        return self.pipeline.predict(df[self._feature_columns])
+        return self._predict(df[self._feature_columns])
 
     # Backwards compatibility shim
     def predict_drop_count(self, df: pd.DataFrame) -> np.ndarray:
@@ -475,6 +828,8 @@ class CauldronFlowModel:
                 "feature_columns": self._feature_columns,
             },
             Path(path),
+            compress=MODEL_COMPRESSION,
+            protocol=5,
         )
 
     @classmethod
@@ -484,6 +839,7 @@ class CauldronFlowModel:
         model = cls(config=artifact["config"])
         model.pipeline = artifact["pipeline"]
         model._feature_columns = artifact.get("feature_columns")
+        model._compile_regressor()
         return model
 
 
@@ -503,9 +859,8 @@ def example_usage() -> None:
 
     latest_window = (
         training_df.reset_index()
-        .sort_values("timestamp")
-        .groupby("cauldron_id")
-        .tail(1)
+        .sort_values(["cauldron_id", "timestamp"])
+        .drop_duplicates(subset="cauldron_id", keep="last")
     )
     flow_predictions = model.predict_flow_rate(latest_window)
     print(
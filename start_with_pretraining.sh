@@ -22,5 +22,10 @@ fi
 
 echo "Starting Prophet API server..."
 echo ""
-python3 prophet_api.py
+# Serve with gunicorn (gunicorn.conf.py) when installed, otherwise the Flask server
+if command -v gunicorn >/dev/null 2>&1; then
+    gunicorn -c gunicorn.conf.py prophet_api:app
+else
+    python3 prophet_api.py
+fi
 